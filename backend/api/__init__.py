@@ -0,0 +1 @@
+default_app_config = 'api.apps.ApiV1Config'
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.contrib.admin import ModelAdmin, register
 
 from .models import (Cart, Comment, Favourite, Follow, Ingredient,
-                     IngredientsAmount, Recipe, Tag, User)
+                     IngredientsAmount, Recipe, ShoppingListItem, Tag, User)
 
 
 @register(User)
@@ -35,7 +35,7 @@ class IngredientsAmountInline(admin.TabularInline):
 class RecipeAdmin(ModelAdmin):
     search_fields = ("name", "text")
     list_filter = ("author", "name", "tags")
-    list_display = ("name", "author")
+    list_display = ("name", "author", "favourites_count")
     inlines = [IngredientsAmountInline]
 
 
@@ -59,6 +59,12 @@ class CartAdmin(ModelAdmin):
     list_display = ("user", "recipe")
 
 
+@register(ShoppingListItem)
+class ShoppingListItemAdmin(ModelAdmin):
+    list_display = ("user", "ingredient", "amount")
+    search_fields = ("user__email",)
+
+
 @register(Comment)
 class CommentAdmin(ModelAdmin):
     list_display = ("recipe", "author", "text", "pub_date")
@@ -0,0 +1,148 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .models import User
+
+VERSION_KEY = 'token-cache:user:{}'
+STATS_KEYS = {
+    'hits': 'token-cache:hits',
+    'misses': 'token-cache:misses',
+}
+USER_FIELDS = [field.attname for field in User._meta.concrete_fields]
+TOKEN_FIELDS = [field.attname for field in Token._meta.concrete_fields]
+
+
+class TokenCache:
+    """
+    Bounded per-process cache from token key to user.
+
+    Entries expire after ttl seconds. Invalidation bumps a per-user version
+    in the shared cache, so every worker process drops the user's entries
+    on its next lookup.
+    """
+
+    def __init__(self, max_size, ttl, flush_every=100):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.flush_every = flush_every
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = dict.fromkeys(STATS_KEYS, 0)
+
+    def get_version(self, user_id, create=False):
+        key = VERSION_KEY.format(user_id)
+        if create:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+        return cache.get(key)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None:
+            expires, version, user_values, token_values = entry
+            user_id = user_values[USER_FIELDS.index('id')]
+            if (expires < time.monotonic()
+                    or self.get_version(user_id) != version):
+                entry = None
+                with self._lock:
+                    self._entries.pop(key, None)
+        self.record('misses' if entry is None else 'hits')
+        if entry is None:
+            return None
+        user = User.from_db(DEFAULT_DB_ALIAS, USER_FIELDS, user_values)
+        token = Token.from_db(DEFAULT_DB_ALIAS, TOKEN_FIELDS, token_values)
+        token.user = user
+        return user, token
+
+    def get_version_for_key(self, key):
+        user_id = Token.objects.filter(key=key).values_list(
+            'user_id', flat=True).first()
+        if user_id is None:
+            return None
+        return self.get_version(user_id, create=True)
+
+    def set(self, key, user, token, version):
+        if version is None:
+            return
+        entry = (
+            time.monotonic() + self.ttl,
+            version,
+            [getattr(user, name) for name in USER_FIELDS],
+            [getattr(token, name) for name in TOKEN_FIELDS],
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id):
+        cache.set(VERSION_KEY.format(user_id), uuid.uuid4().hex,
+                  timeout=None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def record(self, outcome):
+        with self._lock:
+            self._pending[outcome] += 1
+            if sum(self._pending.values()) < self.flush_every:
+                return
+            pending = self._pending
+            self._pending = dict.fromkeys(STATS_KEYS, 0)
+        self.flush(pending)
+
+    def flush(self, pending=None):
+        if pending is None:
+            with self._lock:
+                pending = self._pending
+                self._pending = dict.fromkeys(STATS_KEYS, 0)
+        for outcome, count in pending.items():
+            if count:
+                cache.add(STATS_KEYS[outcome], 0, timeout=None)
+                try:
+                    cache.incr(STATS_KEYS[outcome], count)
+                except ValueError:
+                    pass
+
+    def get_stats(self):
+        self.flush()
+        hits = cache.get(STATS_KEYS['hits'], 0)
+        misses = cache.get(STATS_KEYS['misses'], 0)
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / lookups if lookups else 0.0,
+        }
+
+
+token_cache = TokenCache(
+    max_size=settings.TOKEN_CACHE_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL,
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        # The version is read before the rows. An invalidation committed in
+        # between then makes the new entry stale instead of stamping rows
+        # read before the commit with the version that follows it.
+        version = token_cache.get_version_for_key(key)
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token, version)
+        return user, token
@@ -0,0 +1,268 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+MAGIC = b'FGCACHE3'
+HEADER = struct.Struct('<8sIIQQQ')
+HEADER_SIZE = 64
+SLOT_HEADER = struct.Struct('<QdQII')
+ASSOCIATIVITY = 8
+NEVER = 0.0
+
+
+class SharedMemoryCache(BaseCache):
+    """
+    Cache shared by every process on the host through one memory-mapped file.
+
+    The file holds a fixed number of equally sized slots grouped in sets of
+    ASSOCIATIVITY. A key may only live in its own set, and a full set evicts
+    its expired or least recently used slot. Entries that do not fit in a
+    slot are not cached.
+
+    A slot header is written after its payload and carries the payload's
+    CRC32, so a slot left half-written by a killed process reads as a miss.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.slot_size = int(options.get('SLOT_SIZE', 16 * 1024))
+        slots = int(options.get('SLOTS', 2048))
+        self.sets = max(slots // ASSOCIATIVITY, 1)
+        self.slots = self.sets * ASSOCIATIVITY
+        self.size = HEADER_SIZE + self.slots * self.slot_size
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._pid = None
+        self._file = None
+        self._map = None
+
+    def _open(self):
+        if self._pid == os.getpid():
+            return
+        if self._file is not None:
+            self._map.close()
+            os.close(self._file)
+        self._file = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        try:
+            header = os.pread(self._file, HEADER.size, 0)
+            if (os.fstat(self._file).st_size != self.size
+                    or header[:8] != MAGIC
+                    or HEADER.unpack(header)[1:3] != (self.slots,
+                                                      self.slot_size)):
+                os.ftruncate(self._file, 0)
+                os.ftruncate(self._file, self.size)
+                os.pwrite(self._file,
+                          HEADER.pack(MAGIC, self.slots, self.slot_size,
+                                      0, 0, 0), 0)
+            self._map = mmap.mmap(self._file, self.size)
+        finally:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._pid = os.getpid()
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            self._open()
+            if not self._depth:
+                fcntl.flock(self._file, fcntl.LOCK_EX)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if not self._depth:
+                    fcntl.flock(self._file, fcntl.LOCK_UN)
+
+    def _counters(self):
+        return HEADER.unpack_from(self._map, 0)[3:]
+
+    def _set_counters(self, clock, hits, misses):
+        HEADER.pack_into(self._map, 0, MAGIC, self.slots, self.slot_size,
+                         clock, hits, misses)
+
+    def _tick(self, hit=None):
+        clock, hits, misses = self._counters()
+        if hit is True:
+            hits += 1
+        elif hit is False:
+            misses += 1
+        self._set_counters(clock + 1, hits, misses)
+        return clock + 1
+
+    def _offset(self, slot):
+        return HEADER_SIZE + slot * self.slot_size
+
+    def _read_slot(self, slot):
+        return SLOT_HEADER.unpack_from(self._map, self._offset(slot))
+
+    def _clear_slot(self, slot):
+        SLOT_HEADER.pack_into(self._map, self._offset(slot),
+                              0, NEVER, 0, 0, 0)
+
+    def _hash(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        # An empty slot has hash 0. The marker bit is the top one so that
+        # the low bits still pick the set.
+        return int.from_bytes(digest, 'little') | 1 << 63
+
+    def _bucket(self, key_hash):
+        first = (key_hash % self.sets) * ASSOCIATIVITY
+        return range(first, first + ASSOCIATIVITY)
+
+    def _find(self, key, key_hash):
+        for slot in self._bucket(key_hash):
+            slot_hash, expires, _, length, checksum = self._read_slot(slot)
+            if slot_hash != key_hash or not length:
+                continue
+            start = self._offset(slot) + SLOT_HEADER.size
+            payload = self._map[start:start + length]
+            try:
+                if zlib.crc32(payload) != checksum:
+                    raise ValueError('Checksum mismatch')
+                stored_key, value = pickle.loads(payload)
+            except Exception:
+                self._clear_slot(slot)
+                continue
+            if stored_key == key:
+                return slot, expires, value
+        return None
+
+    def _is_expired(self, expires):
+        return expires != NEVER and expires <= time.time()
+
+    def _expiry(self, timeout):
+        expires = self.get_backend_timeout(timeout)
+        return NEVER if expires is None else expires
+
+    def _lookup(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        key_hash = self._hash(key)
+        found = self._find(key, key_hash)
+        if found is not None and self._is_expired(found[1]):
+            self._clear_slot(found[0])
+            found = None
+        return key, key_hash, found
+
+    def _store(self, key, key_hash, value, expires, found=None):
+        payload = pickle.dumps((key, value), pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.slot_size - SLOT_HEADER.size:
+            if found is not None:
+                self._clear_slot(found[0])
+            return False
+        if found is not None:
+            slot = found[0]
+        else:
+            slot = min(self._bucket(key_hash), key=self._eviction_rank)
+        offset = self._offset(slot)
+        start = offset + SLOT_HEADER.size
+        self._clear_slot(slot)
+        self._map[start:start + len(payload)] = payload
+        SLOT_HEADER.pack_into(self._map, offset, key_hash, expires,
+                              self._tick(), len(payload), zlib.crc32(payload))
+        return True
+
+    def _eviction_rank(self, slot):
+        _, expires, last_used, length, _ = self._read_slot(slot)
+        if not length:
+            return -2, 0
+        if self._is_expired(expires):
+            return -1, 0
+        return 0, last_used
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked():
+            key, key_hash, found = self._lookup(key, version)
+            if found is not None:
+                return False
+            return self._store(key, key_hash, value, self._expiry(timeout))
+
+    def get(self, key, default=None, version=None):
+        with self._locked():
+            _, _, found = self._lookup(key, version)
+            if found is None:
+                self._tick(hit=False)
+                return default
+            slot, expires, value = found
+            offset = self._offset(slot)
+            key_hash, _, _, length, checksum = self._read_slot(slot)
+            SLOT_HEADER.pack_into(self._map, offset, key_hash, expires,
+                                  self._tick(hit=True), length, checksum)
+            return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked():
+            key, key_hash, found = self._lookup(key, version)
+            self._store(key, key_hash, value, self._expiry(timeout), found)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked():
+            _, _, found = self._lookup(key, version)
+            if found is None:
+                return False
+            slot = found[0]
+            key_hash, _, last_used, length, checksum = self._read_slot(slot)
+            SLOT_HEADER.pack_into(self._map, self._offset(slot), key_hash,
+                                  self._expiry(timeout), last_used, length,
+                                  checksum)
+            return True
+
+    def delete(self, key, version=None):
+        with self._locked():
+            _, _, found = self._lookup(key, version)
+            if found is None:
+                return False
+            self._clear_slot(found[0])
+            return True
+
+    def has_key(self, key, version=None):
+        with self._locked():
+            return self._lookup(key, version)[2] is not None
+
+    def incr(self, key, delta=1, version=None):
+        with self._locked():
+            key, key_hash, found = self._lookup(key, version)
+            if found is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = found[2] + delta
+            self._store(key, key_hash, value, found[1], found)
+            return value
+
+    def clear(self):
+        with self._locked():
+            for slot in range(self.slots):
+                self._clear_slot(slot)
+            self._set_counters(0, 0, 0)
+
+    def get_stats(self):
+        with self._locked():
+            _, hits, misses = self._counters()
+            entries = sum(
+                1 for slot in range(self.slots)
+                if self._read_slot(slot)[3]
+                and not self._is_expired(self._read_slot(slot)[1])
+            )
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / lookups if lookups else 0.0,
+            'entries': entries,
+            'slots': self.slots,
+            'slot_size': self.slot_size,
+        }
+
+    def close(self, **kwargs):
+        pass
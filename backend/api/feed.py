@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .models import FeedEntry, Follow, Recipe, User
+
+# Follow.author is the follower and Follow.user the followed author.
+FAN_OUT_SQL = """
+INSERT INTO {feed} (user_id, recipe_id, author_id, pub_date)
+SELECT author_id, %s, %s, %s FROM {follow} WHERE user_id = %s
+ON CONFLICT (user_id, recipe_id) DO NOTHING
+"""
+BACKFILL_SQL = """
+INSERT INTO {feed} (user_id, recipe_id, author_id, pub_date)
+SELECT %s, id, author_id, pub_date FROM {recipe}
+WHERE author_id = %s
+ORDER BY pub_date DESC, id DESC
+LIMIT %s
+ON CONFLICT (user_id, recipe_id) DO NOTHING
+"""
+REBUILD_SQL = """
+INSERT INTO {feed} (user_id, recipe_id, author_id, pub_date)
+SELECT {follow}.author_id, latest.id, latest.author_id, latest.pub_date
+FROM {follow}
+JOIN (
+    SELECT id, author_id, pub_date, ROW_NUMBER() OVER (
+        PARTITION BY author_id ORDER BY pub_date DESC, id DESC
+    ) AS position
+    FROM {recipe}
+) latest ON latest.author_id = {follow}.user_id
+JOIN {user} ON {user}.id = latest.author_id
+WHERE NOT {user}.fan_out_on_read AND latest.position <= %s
+"""
+
+
+def get_sql(template):
+    return template.format(
+        feed=FeedEntry._meta.db_table,
+        follow=Follow._meta.db_table,
+        recipe=Recipe._meta.db_table,
+        user=User._meta.db_table,
+    )
+
+
+def switch_to_read(author_id):
+    # Once an author is read on demand they stay that way, so recipes
+    # published while they were popular are never missing from feeds.
+    return User.objects.filter(
+        Q(fan_out_on_read=True)
+        | Q(followers_count__gte=settings.FEED_FAN_OUT_LIMIT),
+        pk=author_id,
+    ).update(fan_out_on_read=True) > 0
+
+
+def fan_out(recipe):
+    if switch_to_read(recipe.author_id):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(get_sql(FAN_OUT_SQL), [
+            recipe.pk, recipe.author_id,
+            connection.ops.adapt_datetimefield_value(recipe.pub_date),
+            recipe.author_id,
+        ])
+
+
+def follow(follower_id, author_id):
+    if User.objects.filter(pk=author_id, fan_out_on_read=True).exists():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(get_sql(BACKFILL_SQL), [
+            follower_id, author_id, settings.FEED_BACKFILL_SIZE])
+
+
+def unfollow(follower_id, author_id):
+    FeedEntry.objects.filter(user=follower_id, author=author_id).delete()
+
+
+def rebuild():
+    User.objects.filter(
+        followers_count__gte=settings.FEED_FAN_OUT_LIMIT,
+    ).update(fan_out_on_read=True)
+    FeedEntry.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(get_sql(REBUILD_SQL), [settings.FEED_BACKFILL_SIZE])
+
+
+def before(position, date_field, id_field):
+    if position is None:
+        return Q()
+    pub_date, pk = position
+    # The redundant bound lets the index range scan start at the cursor.
+    return Q(**{f'{date_field}__lte': pub_date}) & (
+        Q(**{f'{date_field}__lt': pub_date})
+        | Q(**{date_field: pub_date, f'{id_field}__lt': pk}))
+
+
+def get_page(user, position, limit):
+    """
+    Returns up to limit (pub_date, recipe id) pairs older than position and
+    whether there are more.
+
+    Fanned-out recipes come from the user's timeline, recipes of authors
+    read on demand come from the recipes table, and the two are merged.
+    """
+    pushed = FeedEntry.objects.filter(
+        before(position, 'pub_date', 'recipe_id'), user=user,
+    ).order_by('-pub_date', '-recipe_id').values_list(
+        'pub_date', 'recipe_id')[:limit + 1]
+    pulled = Recipe.objects.filter(
+        before(position, 'pub_date', 'id'),
+        author__in=Follow.objects.filter(
+            author=user, user__fan_out_on_read=True).values('user'),
+    ).order_by('-pub_date', '-id').values_list('pub_date', 'id')[:limit + 1]
+    # A recipe is in both when its author switched to fan-out on read.
+    merged = sorted(set(pushed) | set(pulled), reverse=True)
+    return merged[:limit], len(merged) > limit
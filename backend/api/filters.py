@@ -1,14 +1,35 @@
 import django_filters
 from django_filters.rest_framework import filters
 
-from .models import Ingredient, Recipe, User
+from .models import Recipe, Tag, User
+from .search import search
+
+ORDERINGS = {
+    'trending': ('-trending_score', '-id'),
+}
 
 
 class RecipeFilter(django_filters.FilterSet):
     author = filters.ModelChoiceFilter(queryset=User.objects.all())
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = filters.ModelMultipleChoiceFilter(
+        field_name='tags__slug',
+        to_field_name='slug',
+        queryset=Tag.objects.all(),
+        method='tags_filter',
+    )
     is_in_shopping_cart = filters.BooleanFilter(method='cart_filter')
     is_favorited = filters.BooleanFilter(method='favorite_filter')
+    search = filters.CharFilter(method='search_filter')
+    ordering = filters.ChoiceFilter(
+        choices=[(name, name) for name in ORDERINGS],
+        method='ordering_filter',
+    )
+
+    def tags_filter(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(pk__in=Recipe.tags.through.objects.filter(
+            tag__in=value).values('recipe'))
 
     def cart_filter(self, queryset, name, value):
         if value:
@@ -22,16 +43,13 @@ class RecipeFilter(django_filters.FilterSet):
         if not value:
             return queryset.all()
 
-    class Meta:
-        model = Recipe
-        fields = ['author', 'tags', 'is_in_shopping_cart', 'is_favorited']
-
+    def search_filter(self, queryset, name, value):
+        return search(queryset, value)
 
-class IngredientFilter(django_filters.FilterSet):
-    name = django_filters.CharFilter(field_name='name',
-                                     lookup_expr='startswith',
-                                     )
+    def ordering_filter(self, queryset, name, value):
+        return queryset.order_by(*ORDERINGS[value])
 
     class Meta:
-        model = Ingredient
-        fields = ('name',)
+        model = Recipe
+        fields = ['author', 'tags', 'is_in_shopping_cart', 'is_favorited',
+                  'search', 'ordering']
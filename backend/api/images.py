@@ -0,0 +1,90 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from PIL import Image, ImageOps
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+}
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.RECIPE_IMAGE_WORKERS,
+    thread_name_prefix='recipe-images',
+)
+
+
+def get_variant_name(image_name, size, extension):
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return f'{settings.RECIPE_IMAGE_VARIANTS_DIR}/{stem}-{size}.{extension}'
+
+
+def has_variants(recipe):
+    return bool(recipe.image) and (
+        recipe.image_variants_source == recipe.image.name)
+
+
+def get_variant_urls(recipe):
+    if not has_variants(recipe):
+        return None
+    return {
+        size: {
+            extension: default_storage.url(
+                get_variant_name(recipe.image.name, size, extension))
+            for extension in FORMATS
+        }
+        for size in settings.RECIPE_IMAGE_SIZES
+    }
+
+
+def render_variants(image_file):
+    with Image.open(image_file) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+    for size, bounds in settings.RECIPE_IMAGE_SIZES.items():
+        variant = image.copy()
+        variant.thumbnail(bounds, Image.LANCZOS)
+        for extension, (image_format, options) in FORMATS.items():
+            buffer = BytesIO()
+            variant.save(buffer, image_format, **options)
+            yield size, extension, buffer.getvalue()
+
+
+def generate_variants(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'image', 'image_variants_source').first()
+    if recipe is None or not recipe.image or has_variants(recipe):
+        return False
+    image_name = recipe.image.name
+    with recipe.image.open('rb') as image_file:
+        variants = list(render_variants(image_file))
+    for size, extension, content in variants:
+        name = get_variant_name(image_name, size, extension)
+        default_storage.delete(name)
+        default_storage.save(name, ContentFile(content))
+    Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+        image_variants_source=image_name)
+    return True
+
+
+def run_job(recipe_id):
+    try:
+        generate_variants(recipe_id)
+    except Exception:
+        logger.exception('Could not generate image variants for recipe %s',
+                         recipe_id)
+    finally:
+        close_old_connections()
+
+
+def submit(recipe_id):
+    return executor.submit(run_job, recipe_id)
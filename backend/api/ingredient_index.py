@@ -0,0 +1,83 @@
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+
+from django.conf import settings
+
+from . import versions
+from .models import Ingredient
+
+
+def fold(text):
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(char for char in decomposed
+                   if not unicodedata.combining(char))
+
+
+class IngredientIndex:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def get_version(self):
+        return versions.get_version(None, versions.INGREDIENTS).version
+
+    def build(self, version):
+        rows = Ingredient.objects.values('id', 'name', 'measurement_unit')
+        entries = sorted(
+            ((fold(row['name']), row['id'], row) for row in rows),
+            key=lambda entry: entry[:2],
+        )
+        keys = [key for key, _, _ in entries]
+        items = [row for _, _, row in entries]
+        return time.monotonic(), version, keys, items
+
+    def is_stale(self, snapshot, version):
+        if snapshot is None or time.monotonic() - snapshot[0] > self.ttl:
+            return True
+        return snapshot[1] < version
+
+    def snapshot(self, version=None):
+        # Other workers change ingredients too, so the shared version is
+        # what keeps the index in line with the ETag sent with it. It is
+        # read before the rows, so a snapshot is never labelled newer than
+        # its contents.
+        if version is None:
+            version = self.get_version()
+        snapshot = self._snapshot
+        if self.is_stale(snapshot, version):
+            with self._lock:
+                if self._snapshot is snapshot:
+                    self._snapshot = self.build(version)
+                snapshot = self._snapshot
+        return snapshot[2:]
+
+    def search(self, query='', limit=None, version=None):
+        keys, items = self.snapshot(version)
+        needle = fold(query)
+        if not needle:
+            return items[:limit]
+
+        result = []
+        position = bisect_left(keys, needle)
+        prefix_end = position
+        while prefix_end < len(keys) and keys[prefix_end].startswith(needle):
+            prefix_end += 1
+        result.extend(items[position:prefix_end])
+        if limit is not None and len(result) >= limit:
+            return result[:limit]
+
+        for index, key in enumerate(keys):
+            if needle in key and not position <= index < prefix_end:
+                result.append(items[index])
+                if limit is not None and len(result) >= limit:
+                    break
+        return result
+
+
+ingredient_index = IngredientIndex(ttl=settings.INGREDIENT_INDEX_TTL)
@@ -0,0 +1,200 @@
+import itertools
+import json
+import math
+import random
+import re
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from api.models import Cart, Follow, Ingredient, Recipe, Tag, User
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+QUERIES_RE = re.compile(r'(?:^|,)\s*db;[^,]*desc="(\d+) queries"')
+SEARCH_WORDS = ('soup', 'chicken', 'tomato', 'pie', 'lemon', 'rice')
+SCENARIOS = {
+    'recipes': lambda rng, data: '/api/recipes/',
+    'recipes_page': lambda rng, data: (
+        f'/api/recipes/?page={rng.randint(2, data["last_page"])}'),
+    'recipes_tags': lambda rng, data: (
+        f'/api/recipes/?tags={rng.choice(data["tags"])}'),
+    'recipes_author': lambda rng, data: (
+        f'/api/recipes/?author={rng.choice(data["authors"])}'),
+    'recipes_favorited': lambda rng, data: '/api/recipes/?is_favorited=1',
+    'recipes_in_cart': lambda rng, data: (
+        '/api/recipes/?is_in_shopping_cart=1'),
+    'recipes_search': lambda rng, data: (
+        f'/api/recipes/?search={rng.choice(SEARCH_WORDS)}'),
+    'recipes_trending': lambda rng, data: '/api/recipes/?ordering=trending',
+    'recipes_similar': lambda rng, data: (
+        f'/api/recipes/{rng.choice(data["recipes"])}/similar/'),
+    'recipes_comments': lambda rng, data: (
+        f'/api/recipes/{rng.choice(data["recipes"])}/comments/'),
+    'feed': lambda rng, data: '/api/recipes/feed/',
+    'subscriptions': lambda rng, data: (
+        '/api/users/subscriptions/?recipes_limit=3'),
+    'shopping_cart_download': lambda rng, data: (
+        '/api/recipes/download_shopping_cart/'),
+    'ingredients_search': lambda rng, data: (
+        f'/api/ingredients/?name={rng.choice(data["ingredient_prefixes"])}'),
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def get_queries(response):
+    match = QUERIES_RE.search(response.headers.get('Server-Timing', ''))
+    return int(match.group(1)) if match else None
+
+
+class Client:
+    def __init__(self, base_url, tokens):
+        self.base_url = base_url.rstrip('/')
+        self.tokens = tokens
+        self.numbers = itertools.count()
+        self.local = threading.local()
+
+    def get_session(self):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            number = next(self.numbers) % len(self.tokens)
+            session = self.local.session = requests.Session()
+            session.headers['Authorization'] = f'Token {self.tokens[number]}'
+        return session
+
+    def get(self, path):
+        started = time.perf_counter()
+        response = self.get_session().get(self.base_url + path)
+        # Streamed responses are timed until the last byte.
+        response.content
+        return response, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = ('Drives the main API endpoints of a running server with a '
+            'dataset built by generate_dataset and reports latency '
+            'percentiles and queries per request.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8000')
+        parser.add_argument('--prefix', default='bench')
+        parser.add_argument('--scenario', action='append',
+                            choices=sorted(SCENARIOS),
+                            help='Run only the given scenarios.')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requests per scenario.')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output',
+                            help='Write the results to a JSON file.')
+        parser.add_argument('--baseline',
+                            help='Compare with the results of a previous '
+                                 'run.')
+
+    def handle(self, *args, **options):
+        data = self.get_data(options)
+        client = Client(options['base_url'], data['tokens'])
+        rng = random.Random(options['seed'])
+        results = {}
+        for name in options['scenario'] or SCENARIOS:
+            paths = [SCENARIOS[name](rng, data)
+                     for _ in range(options['warmup'] + options['requests'])]
+            results[name] = self.run(client, paths, options)
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline']) as source:
+                baseline = json.load(source)['scenarios']
+        self.report(results, baseline)
+        if options['output']:
+            with open(options['output'], 'w') as destination:
+                json.dump({
+                    'settings': {
+                        key: options[key] for key in (
+                            'base_url', 'prefix', 'requests', 'concurrency',
+                            'warmup', 'seed')
+                    },
+                    'scenarios': results,
+                }, destination, indent=2)
+
+    def get_data(self, options):
+        prefix = options['prefix']
+        users = User.objects.filter(username__startswith=f'{prefix}-')
+        clients = list(users.filter(
+            pk__in=Cart.objects.values('user'),
+        ).filter(
+            pk__in=Follow.objects.values('author'),
+        ).order_by('pk')[:options['concurrency']])
+        if not clients:
+            raise CommandError(f'No dataset with the prefix "{prefix}", '
+                               f'run generate_dataset first.')
+        recipes = sum(users.values_list('recipes_count', flat=True))
+        page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+        return {
+            'tokens': [Token.objects.get_or_create(user=user)[0].key
+                       for user in clients],
+            'tags': list(Tag.objects.filter(
+                slug__startswith=f'{prefix}-').values_list('slug', flat=True)),
+            'authors': list(users.filter(recipes_count__gt=0).order_by(
+                '-recipes_count', 'pk').values_list('pk', flat=True)[:100]),
+            'recipes': list(Recipe.objects.filter(author__in=users).order_by(
+                '-favourites_count', 'pk').values_list('pk', flat=True)[:100]),
+            'ingredient_prefixes': sorted({
+                name[:len(prefix) + 3] for name in Ingredient.objects.filter(
+                    name__startswith=f'{prefix} ').values_list(
+                        'name', flat=True)
+            }),
+            'last_page': max(2, min(100, recipes // page_size)),
+        }
+
+    def run(self, client, paths, options):
+        warmup, paths = paths[:options['warmup']], paths[options['warmup']:]
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            list(executor.map(client.get, warmup))
+            started = time.perf_counter()
+            responses = list(executor.map(client.get, paths))
+            elapsed = time.perf_counter() - started
+        latencies = [duration * 1000 for _, duration in responses]
+        queries = [get_queries(response) for response, _ in responses]
+        queries = [count for count in queries if count is not None]
+        return {
+            'requests': len(responses),
+            'errors': sum(response.status_code >= 400
+                          for response, _ in responses),
+            'throughput': round(len(responses) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.5), 1),
+            'p95_ms': round(percentile(latencies, 0.95), 1),
+            'p99_ms': round(percentile(latencies, 0.99), 1),
+            'queries': (round(statistics.mean(queries), 1)
+                        if queries else None),
+        }
+
+    def report(self, results, baseline):
+        self.stdout.write(
+            f'{"scenario":<24}{"req/s":>8}{"errors":>8}{"p50 ms":>10}'
+            f'{"p95 ms":>10}{"p99 ms":>10}{"queries":>9}')
+        for name, result in results.items():
+            queries = result['queries']
+            self.stdout.write(
+                f'{name:<24}{result["throughput"]:>8}{result["errors"]:>8}'
+                f'{result["p50_ms"]:>10}{result["p95_ms"]:>10}'
+                f'{result["p99_ms"]:>10}'
+                f'{"-" if queries is None else queries:>9}')
+            if name in baseline:
+                self.stdout.write(self.compare(result, baseline[name]))
+
+    def compare(self, result, previous):
+        changes = []
+        for key in ('p50_ms', 'p95_ms', 'p99_ms', 'queries'):
+            if result[key] is None or not previous.get(key):
+                continue
+            change = (result[key] - previous[key]) / previous[key]
+            changes.append(f'{key} {change:+.1%}')
+        return f'{"":<24}vs baseline: {", ".join(changes)}'
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from api import recommendations
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = ('Builds the "also favourited" lists of similar recipes from '
+            'favourites and shopping carts. With --since only recipes '
+            'favourited or added to a cart recently are refreshed; removals '
+            'are picked up by the next full build.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=int, metavar='MINUTES',
+                            help='Refresh recipes with activity in the last '
+                                 'MINUTES instead of rebuilding everything.')
+
+    def handle(self, *args, **options):
+        if options['since'] is None:
+            updated = recommendations.rebuild()
+        else:
+            updated = recommendations.refresh(
+                timezone.now() - timedelta(minutes=options['since']))
+        self.stdout.write(f'Similar recipes updated for {updated} recipes')
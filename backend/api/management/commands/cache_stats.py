@@ -0,0 +1,28 @@
+from api.authentication import token_cache
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Shows hit ratio and occupancy of the shared cache and hit '
+            'ratio of the token authentication cache')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default='default')
+
+    def handle(self, *args, **options):
+        cache = caches[options['alias']]
+        if not hasattr(cache, 'get_stats'):
+            raise CommandError(f'{type(cache).__name__} does not keep stats')
+        stats = cache.get_stats()
+        self.stdout.write(
+            f'hits: {stats["hits"]}, misses: {stats["misses"]}, '
+            f'hit ratio: {stats["hit_ratio"]:.2%}, '
+            f'entries: {stats["entries"]}/{stats["slots"]}'
+        )
+        stats = token_cache.get_stats()
+        self.stdout.write(
+            f'token cache hits: {stats["hits"]}, '
+            f'misses: {stats["misses"]}, '
+            f'hit ratio: {stats["hit_ratio"]:.2%}'
+        )
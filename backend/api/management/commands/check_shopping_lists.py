@@ -0,0 +1,31 @@
+from api import shopping_list
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = ('Compares stored shopping lists with the live aggregate over '
+            'shopping carts')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append',
+                            dest='users', help='Check only this user id')
+        parser.add_argument('--fix', action='store_true',
+                            help='Rebuild the shopping lists that drifted')
+
+    def handle(self, *args, **options):
+        drift = shopping_list.find_drift(options['users'])
+        for user_id, ingredient_id, stored, expected in drift:
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'stored {stored}, expected {expected}'
+            )
+        if not drift:
+            self.stdout.write('Shopping lists are consistent')
+            return
+        if not options['fix']:
+            raise CommandError(f'{len(drift)} shopping list rows drifted')
+        user_ids = {user_id for user_id, *_ in drift}
+        with transaction.atomic():
+            shopping_list.rebuild(user_ids)
+        self.stdout.write(f'Rebuilt shopping lists for {len(user_ids)} users')
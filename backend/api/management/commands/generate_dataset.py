@@ -0,0 +1,292 @@
+import itertools
+import random
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from api import feed, recommendations, shopping_list, trending, versions
+from api.ingredient_index import ingredient_index
+from api.models import (Cart, Comment, Favourite, FeedEntry, Follow,
+                        Ingredient, IngredientsAmount, Recipe,
+                        ShoppingListItem, SimilarRecipe, Tag, User)
+from api.search import update_search_vectors
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+WORDS = (
+    'apple', 'bacon', 'basil', 'bean', 'beef', 'berry', 'butter', 'cabbage',
+    'carrot', 'cheese', 'cherry', 'chicken', 'chili', 'cream', 'curry',
+    'egg', 'fennel', 'garlic', 'ginger', 'honey', 'lemon', 'lentil',
+    'mushroom', 'noodle', 'onion', 'orange', 'pasta', 'pear', 'pepper',
+    'pork', 'potato', 'pumpkin', 'rice', 'salmon', 'spinach', 'tomato',
+)
+DISHES = (
+    'soup', 'salad', 'pie', 'stew', 'cake', 'curry', 'roast', 'bread',
+    'omelette', 'pancake', 'risotto', 'casserole', 'chowder', 'tart',
+)
+UNITS = ('g', 'kg', 'ml', 'l', 'pcs', 'tbsp', 'tsp', 'pinch')
+BATCH_SIZE = 1000
+USER_BATCH_SIZE = 500
+ACTIVITY_PERIOD = 30 * 24 * 60 * 60
+
+
+def zipf_weights(count, exponent=1.1):
+    return list(itertools.accumulate(
+        1 / (rank + 1) ** exponent for rank in range(count)))
+
+
+def sample(rng, population, cum_weights, count):
+    count = min(count, len(population))
+    chosen = set()
+    while len(chosen) < count:
+        chosen.update(rng.choices(population, cum_weights=cum_weights,
+                                  k=count - len(chosen)))
+    return sorted(chosen)
+
+
+def created_ids(queryset):
+    return list(queryset.order_by('pk').values_list('pk', flat=True))
+
+
+def delete_rows(queryset):
+    # QuerySet.delete() would fetch every row to send signals that touch
+    # counters and shopping lists one row at a time, and the dataset is
+    # removed as a whole anyway.
+    meta = queryset.model._meta
+    sql, params = queryset.values('pk').query.sql_with_params()
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(meta.db_table)} '
+            f'WHERE {quote(meta.pk.column)} IN ({sql})',
+            params,
+        )
+
+
+class Command(BaseCommand):
+    help = ('Builds a deterministic synthetic dataset for benchmarks. The '
+            'same seed and scale always produce the same rows.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--tags', type=int, default=12)
+        parser.add_argument('--ingredients', type=int, default=500)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--follows-per-user', type=int, default=20)
+        parser.add_argument('--favourites-per-user', type=int, default=30)
+        parser.add_argument('--carts-per-user', type=int, default=5)
+        parser.add_argument('--comments-per-recipe', type=int, default=2)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='bench')
+        parser.add_argument('--flush', action='store_true',
+                            help='Remove a dataset with the same prefix '
+                                 'before building a new one.')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if options['flush']:
+            self.flush(prefix)
+        elif User.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(f'A dataset with the prefix "{prefix}" '
+                               f'already exists, use --flush to rebuild it.')
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            users = self.create_users(prefix, options)
+            tags = self.create_tags(prefix, options)
+            ingredients = self.create_ingredients(prefix, options)
+            recipes = self.create_recipes(rng, users, tags, ingredients,
+                                          options)
+            self.create_follows(rng, users, options)
+            self.create_user_recipes(rng, users, recipes, options)
+            self.create_comments(rng, users, recipes, options)
+            self.analyze()
+            for start in range(0, len(users), USER_BATCH_SIZE):
+                shopping_list.rebuild(users[start:start + USER_BATCH_SIZE])
+            update_search_vectors(Recipe.objects.filter(
+                pk__gte=recipes[0], pk__lte=recipes[-1]))
+            feed.rebuild()
+            recommendations.rebuild()
+            trending.update()
+        self.reference_data_changed()
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(users)} users, {len(recipes)} recipes, '
+            f'{len(tags)} tags and {len(ingredients)} ingredients '
+            f'with the prefix "{prefix}"'))
+
+    def flush(self, prefix):
+        users = User.objects.filter(username__startswith=f'{prefix}-')
+        recipes = Recipe.objects.filter(author__in=users)
+        ingredients = Ingredient.objects.filter(name__startswith=f'{prefix} ')
+        querysets = [
+            ShoppingListItem.objects.filter(
+                Q(user__in=users) | Q(ingredient__in=ingredients)),
+            Cart.objects.filter(Q(user__in=users) | Q(recipe__in=recipes)),
+            Favourite.objects.filter(
+                Q(user__in=users) | Q(recipe__in=recipes)),
+            Follow.objects.filter(Q(user__in=users) | Q(author__in=users)),
+            SimilarRecipe.objects.filter(
+                Q(recipe__in=recipes) | Q(similar__in=recipes)),
+            FeedEntry.objects.filter(
+                Q(user__in=users) | Q(author__in=users)),
+            Comment.objects.filter(
+                Q(author__in=users) | Q(recipe__in=recipes)),
+            Recipe.who_likes_it.through.objects.filter(
+                Q(user__in=users) | Q(recipe__in=recipes)),
+            Recipe.tags.through.objects.filter(recipe__in=recipes),
+            IngredientsAmount.objects.filter(recipe__in=recipes),
+            recipes,
+            Token.objects.filter(user__in=users),
+            users,
+            Tag.objects.filter(slug__startswith=f'{prefix}-'),
+            ingredients,
+        ]
+        with transaction.atomic():
+            for queryset in querysets:
+                delete_rows(queryset)
+        self.reference_data_changed()
+
+    def analyze(self):
+        # Fresh rows have no statistics yet, and the shopping list, search
+        # and feed rebuilds below join the whole dataset.
+        if connection.vendor != 'postgresql':
+            return
+        with connection.cursor() as cursor:
+            for model in (User, Recipe, IngredientsAmount, Follow, Cart):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+    def reference_data_changed(self):
+        ingredient_index.invalidate()
+        versions.bump(versions.INGREDIENTS)
+        versions.bump(versions.TAGS)
+
+    def create_users(self, prefix, options):
+        password = make_password(prefix)
+        User.objects.bulk_create(
+            (User(username=f'{prefix}-{number}',
+                  email=f'{prefix}-{number}@example.com',
+                  first_name=f'{prefix.capitalize()}',
+                  last_name=f'User {number}',
+                  password=password)
+             for number in range(options['users'])),
+            batch_size=BATCH_SIZE,
+        )
+        return created_ids(User.objects.filter(
+            username__startswith=f'{prefix}-'))
+
+    def create_tags(self, prefix, options):
+        Tag.objects.bulk_create(
+            Tag(name=f'{prefix} {DISHES[number % len(DISHES)]} {number}',
+                slug=f'{prefix}-{number}',
+                color=f'#{number * 0x1f3d5b % 0xffffff:06x}')
+            for number in range(options['tags'])
+        )
+        return created_ids(Tag.objects.filter(slug__startswith=f'{prefix}-'))
+
+    def create_ingredients(self, prefix, options):
+        Ingredient.objects.bulk_create(
+            (Ingredient(
+                name=f'{prefix} {WORDS[number % len(WORDS)]} {number}',
+                measurement_unit=UNITS[number % len(UNITS)])
+             for number in range(options['ingredients'])),
+            batch_size=BATCH_SIZE,
+        )
+        return created_ids(Ingredient.objects.filter(
+            name__startswith=f'{prefix} '))
+
+    def create_recipes(self, rng, users, tags, ingredients, options):
+        author_weights = zipf_weights(len(users))
+        authors = rng.choices(users, cum_weights=author_weights,
+                              k=options['recipes'])
+        self.update_counters(User, 'recipes_count', Counter(authors))
+        Recipe.objects.bulk_create(
+            (Recipe(author_id=author,
+                    name=(f'{rng.choice(WORDS).capitalize()} '
+                          f'{rng.choice(DISHES)} {number}'),
+                    text=' '.join(rng.choices(WORDS + DISHES, k=30)),
+                    cooking_time=rng.randint(5, 180),
+                    image=f'recipes/{options["prefix"]}.png')
+             for number, author in enumerate(authors)),
+            batch_size=BATCH_SIZE,
+        )
+        recipes = created_ids(Recipe.objects.filter(
+            author__username__startswith=f'{options["prefix"]}-'))
+        Recipe.tags.through.objects.bulk_create(
+            (Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+             for recipe_id in recipes
+             for tag_id in rng.sample(tags, min(len(tags),
+                                                rng.randint(1, 3)))),
+            batch_size=BATCH_SIZE,
+        )
+        ingredient_weights = zipf_weights(len(ingredients), exponent=0.8)
+        mean = options['ingredients_per_recipe']
+        IngredientsAmount.objects.bulk_create(
+            (IngredientsAmount(recipe_id=recipe_id,
+                               ingredient_id=ingredient_id,
+                               amount=rng.randint(1, 500))
+             for recipe_id in recipes
+             for ingredient_id in sample(
+                 rng, ingredients, ingredient_weights,
+                 max(1, round(rng.gauss(mean, mean / 3))))),
+            batch_size=BATCH_SIZE,
+        )
+        return recipes
+
+    def create_follows(self, rng, users, options):
+        weights = zipf_weights(len(users))
+        followers_count = Counter()
+        follows = []
+        for follower in users:
+            followed = [user_id for user_id in sample(
+                rng, users, weights, options['follows_per_user'] + 1)
+                if user_id != follower][:options['follows_per_user']]
+            followers_count.update(followed)
+            follows.extend(Follow(author_id=follower, user_id=user_id)
+                           for user_id in followed)
+        Follow.objects.bulk_create(follows, batch_size=BATCH_SIZE)
+        self.update_counters(User, 'followers_count', followers_count)
+
+    def create_user_recipes(self, rng, users, recipes, options):
+        weights = zipf_weights(len(recipes))
+        now = timezone.now()
+        for model, field, per_user in (
+                (Favourite, 'favourites_count',
+                 options['favourites_per_user']),
+                (Cart, 'carts_count', options['carts_per_user'])):
+            counts = Counter()
+            rows = []
+            for user_id in users:
+                chosen = sample(rng, recipes, weights, per_user)
+                counts.update(chosen)
+                rows.extend(model(user_id=user_id, recipe_id=recipe_id,
+                                  created=now - timedelta(
+                                      seconds=rng.randint(0, ACTIVITY_PERIOD)))
+                            for recipe_id in chosen)
+            model.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+            self.update_counters(Recipe, field, counts)
+
+    def create_comments(self, rng, users, recipes, options):
+        most = 2 * options['comments_per_recipe']
+        counts = Counter({recipe_id: rng.randint(0, most)
+                          for recipe_id in recipes})
+        Comment.objects.bulk_create(
+            (Comment(recipe_id=recipe_id, author_id=rng.choice(users),
+                     text=' '.join(rng.choices(WORDS, k=12)))
+             for recipe_id in recipes
+             for _ in range(counts[recipe_id])),
+            batch_size=BATCH_SIZE,
+        )
+        self.update_counters(Recipe, 'comments_count', +counts)
+
+    def update_counters(self, model, field, counts):
+        by_value = defaultdict(list)
+        for pk, value in counts.items():
+            by_value[value].append(pk)
+        for value, pks in by_value.items():
+            for start in range(0, len(pks), BATCH_SIZE // 2):
+                model.objects.filter(
+                    pk__in=pks[start:start + BATCH_SIZE // 2]
+                ).update(**{field: value})
@@ -0,0 +1,28 @@
+from api import images
+from api.models import Recipe
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+
+class Command(BaseCommand):
+    help = ('Generates thumbnail and WebP variants for recipe images that '
+            'do not have them yet')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipe', type=int, action='append',
+                            dest='recipes', help='Process only this recipe')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image__isnull=True).exclude(
+            image='').exclude(image_variants_source=F('image'))
+        if options['recipes']:
+            recipes = recipes.filter(pk__in=options['recipes'])
+        generated = failed = 0
+        for recipe_id in recipes.values_list('pk', flat=True).iterator():
+            try:
+                generated += images.generate_variants(recipe_id)
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'recipe={recipe_id}: {error}')
+        self.stdout.write(
+            f'Generated variants for {generated} recipes, {failed} failed')
@@ -0,0 +1,167 @@
+import csv
+import io
+import json
+import os
+import re
+
+from api import search, versions
+from api.ingredient_index import ingredient_index
+from api.models import Ingredient, IngredientsAmount
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+FIELDS = ('name', 'measurement_unit')
+SEPARATORS = re.compile(r'[\s,]*')
+
+
+def iter_json(file, chunk_size=64 * 1024):
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('The JSON source must be an array')
+    position = 1
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if buffer[position:position + 1] == ']':
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except ValueError:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise CommandError('Malformed JSON source')
+            buffer, position = buffer[position:] + chunk, 0
+        else:
+            yield item
+
+
+def iter_csv(file):
+    for row in csv.reader(file):
+        if not row or [value.strip() for value in row[:2]] == list(FIELDS):
+            continue
+        if len(row) < 2:
+            raise CommandError(f'Malformed CSV row: {row}')
+        yield {'name': row[0], 'measurement_unit': row[1]}
+
+
+def normalize(item):
+    if 'fields' in item:
+        pk = item.get('pk')
+        item = item['fields']
+    else:
+        pk = item.get('id')
+    try:
+        return pk, tuple(item[field].strip() for field in FIELDS)
+    except (KeyError, AttributeError):
+        raise CommandError(f'Malformed ingredient: {item}')
+
+
+class Command(BaseCommand):
+    help = ('Loads ingredients from a JSON (plain list or fixture) or CSV '
+            'file, skipping rows that are already in the database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=('json', 'csv'),
+                            help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        source_format = (options['format']
+                         or os.path.splitext(options['path'])[1][1:].lower())
+        if source_format not in ('json', 'csv'):
+            raise CommandError('Use --format to set the source format')
+        self.batch_size = options['batch_size']
+        self.inserted = self.updated = self.skipped = 0
+        self.renamed = []
+
+        existing = {}
+        for pk, *key in Ingredient.objects.values_list('pk', *FIELDS):
+            existing[pk] = tuple(key)
+        self.existing_keys = set(existing.values())
+        self.existing = existing
+
+        with open(options['path'], encoding='utf-8') as file:
+            items = (iter_json(file) if source_format == 'json'
+                     else iter_csv(file))
+            self.load(normalize(item) for item in items)
+
+        ingredient_index.invalidate()
+        if self.inserted or self.updated:
+            versions.bump(versions.INGREDIENTS)
+        self.update_search_vectors()
+        self.stdout.write(
+            f'Inserted: {self.inserted}, updated: {self.updated}, '
+            f'skipped: {self.skipped}'
+        )
+
+    def load(self, items):
+        new, new_with_pk, changed = [], [], []
+        for pk, key in items:
+            known = pk is not None and pk in self.existing
+            if (self.existing.get(pk) == key if known
+                    else key in self.existing_keys):
+                self.skipped += 1
+                continue
+            if known:
+                changed.append(Ingredient(pk, *key))
+                if self.existing[pk][0] != key[0]:
+                    self.renamed.append(pk)
+            elif pk is not None:
+                new_with_pk.append((pk, *key))
+            else:
+                new.append(key)
+            if pk is not None:
+                self.existing[pk] = key
+            self.existing_keys.add(key)
+
+            if max(len(new), len(new_with_pk),
+                   len(changed)) >= self.batch_size:
+                self.flush(new, new_with_pk, changed)
+                new, new_with_pk, changed = [], [], []
+        self.flush(new, new_with_pk, changed)
+        if self.inserted:
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                        no_style(), [Ingredient]):
+                    cursor.execute(sql)
+
+    def flush(self, new, new_with_pk, changed):
+        with transaction.atomic():
+            self.insert(FIELDS, new)
+            self.insert(('id',) + FIELDS, new_with_pk)
+            if changed:
+                Ingredient.objects.bulk_update(changed, FIELDS)
+        self.inserted += len(new) + len(new_with_pk)
+        self.updated += len(changed)
+
+    def update_search_vectors(self):
+        # Ingredient names are part of the recipes' search vectors, which
+        # bulk_update does not refresh through the post_save receivers.
+        if not self.renamed or not search.is_supported():
+            return
+        recipe_ids = set()
+        for start in range(0, len(self.renamed), self.batch_size):
+            recipe_ids.update(IngredientsAmount.objects.filter(
+                ingredient__in=self.renamed[start:start + self.batch_size]
+            ).values_list('recipe', flat=True))
+        search.update_recipes(recipe_ids)
+
+    def insert(self, columns, rows):
+        if not rows:
+            return
+        if connection.vendor != 'postgresql':
+            Ingredient.objects.bulk_create(
+                [Ingredient(**dict(zip(columns, row))) for row in rows])
+            return
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {Ingredient._meta.db_table} ({", ".join(columns)}) '
+                f'FROM STDIN WITH (FORMAT csv, '
+                f'FORCE_NOT_NULL ({", ".join(FIELDS)}))',
+                buffer,
+            )
@@ -0,0 +1,52 @@
+from api.models import Cart, Comment, Favourite, Follow, Recipe, User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+COUNTERS = {
+    User: {
+        'recipes_count': (Recipe, 'author'),
+        'followers_count': (Follow, 'user'),
+    },
+    Recipe: {
+        'favourites_count': (Favourite, 'recipe'),
+        'carts_count': (Cart, 'recipe'),
+        'comments_count': (Comment, 'recipe'),
+    },
+}
+
+
+def actual_count(model, field):
+    counts = model.objects.filter(**{field: OuterRef('pk')}).order_by(
+    ).values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def rebuild(model, counters):
+    actual = {
+        name: actual_count(*source) for name, source in counters.items()
+    }
+    drifted = Q()
+    for name in counters:
+        drifted |= ~Q(**{name: F(f'actual_{name}')})
+    drifted_ids = list(model.objects.annotate(
+        **{f'actual_{name}': value for name, value in actual.items()}
+    ).filter(drifted).values_list('pk', flat=True))
+    if drifted_ids:
+        model.objects.filter(pk__in=drifted_ids).update(**actual)
+    return len(drifted_ids)
+
+
+class Command(BaseCommand):
+    help = ('Recalculates denormalized recipe, follower, favourite, '
+            'shopping cart and comment counters')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for model, counters in COUNTERS.items():
+                fixed = rebuild(model, counters)
+                self.stdout.write(
+                    f'{model._meta.verbose_name_plural.capitalize()}: '
+                    f'{fixed} rows corrected'
+                )
@@ -0,0 +1,11 @@
+from api import trending
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ('Recalculates the time-decayed trending scores used by '
+            '?ordering=trending. Meant to run every few minutes.')
+
+    def handle(self, *args, **options):
+        updated = trending.update()
+        self.stdout.write(f'Trending scores updated for {updated} recipes')
@@ -0,0 +1,49 @@
+# Generated by Django 2.2.6 on 2026-10-17 04:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+
+
+def fill_shopping_lists(apps, schema_editor):
+    IngredientsAmount = apps.get_model('api', 'IngredientsAmount')
+    ShoppingListItem = apps.get_model('api', 'ShoppingListItem')
+    rows = IngredientsAmount.objects.filter(
+        recipe__to_cart__isnull=False
+    ).values('recipe__to_cart__user', 'ingredient').annotate(
+        total=Sum('amount'))
+    ShoppingListItem.objects.bulk_create([
+        ShoppingListItem(user_id=row['recipe__to_cart__user'],
+                         ingredient_id=row['ingredient'],
+                         amount=row['total'])
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_user_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(verbose_name='Amount')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list_items', to='api.Ingredient', verbose_name='Ingredient')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Shopping list item',
+                'verbose_name_plural': 'Shopping list items',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopping_list_item'),
+        ),
+        migrations.RunPython(fill_shopping_lists, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.6 on 2026-10-17 04:45
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceVersion',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Table')),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='Version')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Updated at')),
+            ],
+            options={
+                'verbose_name': 'Reference data version',
+                'verbose_name_plural': 'Reference data versions',
+            },
+        ),
+    ]
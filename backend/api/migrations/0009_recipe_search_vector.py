@@ -0,0 +1,63 @@
+# Generated by Django 2.2.6 on 2026-10-17 04:52
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+SEARCH_INDEX = django.contrib.postgres.indexes.GinIndex(
+    fields=['search_vector'], name='recipe_search_vector_gin')
+
+FILL_SEARCH_VECTORS = """
+UPDATE api_recipe recipe SET search_vector =
+    setweight(to_tsvector(%(config)s, coalesce(recipe.name, '')), 'A')
+    || setweight(to_tsvector(%(config)s, coalesce((
+        SELECT string_agg(ingredient.name, ' ')
+        FROM api_ingredientsamount amount
+        JOIN api_ingredient ingredient ON ingredient.id = amount.ingredient_id
+        WHERE amount.recipe_id = recipe.id
+    ), '')), 'B')
+    || setweight(to_tsvector(%(config)s, coalesce(recipe.text, '')), 'C')
+"""
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    model = apps.get_model('api', 'Recipe')
+    schema_editor.add_index(model, SEARCH_INDEX)
+    schema_editor.execute(FILL_SEARCH_VECTORS,
+                          {'config': settings.RECIPE_SEARCH_CONFIG})
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    model = apps.get_model('api', 'Recipe')
+    schema_editor.remove_index(model, SEARCH_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_referenceversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='recipe',
+                    index=SEARCH_INDEX,
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_search_index, drop_search_index),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-17 04:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_recipe_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants_source',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100, verbose_name='Image the variants were generated from'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.6 on 2026-10-17 06:18
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_comments_count(apps, schema_editor):
+    Recipe = apps.get_model('api', 'Recipe')
+    Comment = apps.get_model('api', 'Comment')
+    counts = Comment.objects.filter(recipe=OuterRef('pk')).order_by(
+    ).values('recipe').annotate(total=Count('pk')).values('total')
+    Recipe.objects.update(comments_count=Coalesce(
+        Subquery(counts, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_recipe_trending_score'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'ordering': ('-pub_date', '-id'), 'verbose_name': 'Comment', 'verbose_name_plural': 'Comments'},
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Comments count'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['recipe', '-pub_date', '-id'], name='comment_recipe_pub_date_idx'),
+        ),
+        migrations.RunPython(fill_comments_count, migrations.RunPython.noop),
+    ]
@@ -1,14 +1,28 @@
 from colorfield.fields import ColorField
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser, UserManager
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, RegexValidator
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.db import models, transaction
+from django.db.models import (BooleanField, Exists, F, OuterRef,
+                              UniqueConstraint, Value, Window)
+from django.db.models.functions import RowNumber
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils import timezone
 from rest_framework.authtoken.models import Token
 
 
+class AtomicSaveModel(models.Model):
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
 class User(AbstractUser):
     USER = 'user'
     ADMIN = 'admin'
@@ -36,6 +50,21 @@ class User(AbstractUser):
         choices=USER_ROLES,
         default=USER
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Recipes count',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Followers count',
+        default=0,
+        editable=False,
+    )
+    fan_out_on_read = models.BooleanField(
+        verbose_name='Feed is read from the recipes table',
+        default=False,
+        editable=False,
+    )
 
     objects = UserManager()
 
@@ -111,7 +140,58 @@ class Ingredient(models.Model):
         return f"{self.name} ({self.measurement_unit})"
 
 
-class Recipe(models.Model):
+class ReferenceVersion(models.Model):
+    name = models.CharField(
+        max_length=50,
+        primary_key=True,
+        verbose_name='Table',
+    )
+    version = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Version',
+    )
+    updated_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Updated at',
+    )
+
+    class Meta:
+        verbose_name = 'Reference data version'
+        verbose_name_plural = 'Reference data versions'
+
+    def __str__(self):
+        return f'{self.name} v{self.version}'
+
+
+class RecipeQuerySet(models.QuerySet):
+    def with_user_flags(self, user):
+        if user is None or user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        return self.annotate(
+            is_favorited=Exists(Favourite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(Cart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+        )
+
+    def latest_per_author(self, limit):
+        ranked = self.annotate(recipe_rank=Window(
+            expression=RowNumber(),
+            partition_by=[F('author')],
+            order_by=[F('pub_date').desc(), F('id').desc()],
+        ))
+        sql, params = ranked.query.sql_with_params()
+        return self.raw(
+            f'SELECT * FROM ({sql}) ranked WHERE ranked.recipe_rank <= %s '
+            f'ORDER BY ranked.author_id, ranked.recipe_rank',
+            params + (limit,)
+        )
+
+
+class Recipe(AtomicSaveModel):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -128,6 +208,13 @@ class Recipe(models.Model):
         null=True,
         verbose_name='Image',
     )
+    image_variants_source = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='Image the variants were generated from',
+    )
     text = models.TextField(
         verbose_name='Description',
         help_text='Enter recipe description',
@@ -162,9 +249,45 @@ class Recipe(models.Model):
         verbose_name='Who liked it',
         blank=True
     )
+    favourites_count = models.PositiveIntegerField(
+        verbose_name='Favourites count',
+        default=0,
+        editable=False,
+    )
+    carts_count = models.PositiveIntegerField(
+        verbose_name='Shopping carts count',
+        default=0,
+        editable=False,
+    )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Comments count',
+        default=0,
+        editable=False,
+    )
+    trending_score = models.FloatField(
+        verbose_name='Trending score',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='recipe_author_pub_date_idx'),
+            models.Index(fields=['-trending_score', '-id'],
+                         name='recipe_trending_idx'),
+            GinIndex(fields=['search_vector'],
+                     name='recipe_search_vector_gin'),
+        ]
         verbose_name = 'Recipe'
         verbose_name_plural = 'Recipes'
 
@@ -207,7 +330,7 @@ class IngredientsAmount(models.Model):
         return f"{self.recipe} - {self.ingredient}"
 
 
-class Follow(models.Model):
+class Follow(AtomicSaveModel):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -236,7 +359,7 @@ class Follow(models.Model):
         return f"{self.author} - {self.user}"
 
 
-class Favourite(models.Model):
+class Favourite(AtomicSaveModel):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -249,6 +372,11 @@ class Favourite(models.Model):
         verbose_name="Recipe",
         related_name="favourites",
     )
+    created = models.DateTimeField(
+        verbose_name="Added",
+        default=timezone.now,
+        db_index=True,
+    )
 
     class Meta:
         constraints = [
@@ -263,7 +391,7 @@ class Favourite(models.Model):
         return f"{self.user} - {self.recipe}"
 
 
-class Cart(models.Model):
+class Cart(AtomicSaveModel):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -277,6 +405,11 @@ class Cart(models.Model):
         on_delete=models.CASCADE,
         related_name="to_cart",
     )
+    created = models.DateTimeField(
+        verbose_name="Added",
+        default=timezone.now,
+        db_index=True,
+    )
 
     class Meta:
         constraints = [
@@ -291,7 +424,121 @@ class Cart(models.Model):
         return f"{self.user} - {self.recipe}"
 
 
-class Comment(models.Model):
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="User",
+        related_name="shopping_list",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name="Ingredient",
+        related_name="shopping_list_items",
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name="Amount",
+    )
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item')
+        ]
+        verbose_name = "Shopping list item"
+        verbose_name_plural = "Shopping list items"
+
+    def __str__(self):
+        return f"{self.user} - {self.ingredient}: {self.amount}"
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        db_index=False,
+        verbose_name="Recipe",
+        related_name="similar_recipes",
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name="Similar recipe",
+        related_name="similar_to",
+    )
+    score = models.FloatField(
+        verbose_name="Similarity",
+    )
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique_similar_recipe')
+        ]
+        indexes = [
+            models.Index(fields=['recipe', '-score'],
+                         name='similar_recipe_score_idx'),
+        ]
+        verbose_name = "Similar recipe"
+        verbose_name_plural = "Similar recipes"
+
+    def __str__(self):
+        return f"{self.recipe} - {self.similar}: {self.score:.3f}"
+
+
+class FeedEntry(models.Model):
+    # Timelines are derived from Follow and Recipe and are written once per
+    # follower on every new recipe, so the rows skip database-level foreign
+    # key checks. Deletes still cascade through the ORM.
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        db_index=False,
+        verbose_name="Follower",
+        related_name="feed_entries",
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        verbose_name="Recipe",
+        related_name="feed_entries",
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        verbose_name="Author",
+        related_name="+",
+    )
+    pub_date = models.DateTimeField(
+        verbose_name="Publication date",
+    )
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-recipe'],
+                         name='feed_entry_user_pub_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='feed_entry_user_author_idx'),
+        ]
+        verbose_name = "Feed entry"
+        verbose_name_plural = "Feed entries"
+
+    def __str__(self):
+        return f"{self.user} - {self.recipe}"
+
+
+class Comment(AtomicSaveModel):
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
@@ -317,7 +564,11 @@ class Comment(models.Model):
     )
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(fields=['recipe', '-pub_date', '-id'],
+                         name='comment_recipe_pub_date_idx'),
+        ]
         verbose_name = 'Comment'
         verbose_name_plural = 'Comments'
 
@@ -0,0 +1,143 @@
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .filters import ORDERINGS
+
+
+def after(position, value_field, id_field, reverse=False):
+    value, pk = position
+    lookup = 'gt' if reverse else 'lt'
+    # The inclusive bound on the value alone gives the planner an index
+    # condition to start the scan at.
+    return Q(**{f'{value_field}__{lookup}e': value}) & (
+        Q(**{f'{value_field}__{lookup}': value})
+        | Q(**{value_field: value, f'{id_field}__{lookup}': pk}))
+
+
+class RecipeCursorPagination(CursorPagination):
+    """
+    Cursor pagination of the recipe list.
+
+    The default ordering by publication date uses the DRF cursor. Orderings
+    from ORDERINGS sort by a score that many recipes share, which the DRF
+    cursor can only step over with an offset, so they page by a keyset of
+    the score and the id instead.
+    """
+    ordering = ('-pub_date', '-id')
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = ORDERINGS.get(request.query_params.get('ordering'))
+        if self.keyset is None:
+            return super().paginate_queryset(queryset, request, view)
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        fields = [field.lstrip('-') for field in self.keyset]
+        queryset = queryset.order_by(*(fields if reverse else self.keyset))
+        if self.cursor is not None:
+            queryset = queryset.filter(after(
+                self.decode_position(self.cursor.position), *fields,
+                reverse=reverse))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        return self.page
+
+    def decode_position(self, position):
+        try:
+            value, pk = position.split('|')
+            return float(value), int(pk)
+        except (AttributeError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_position(self, recipe, reverse):
+        field = self.keyset[0].lstrip('-')
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=reverse,
+            position=f'{getattr(recipe, field)!r}|{recipe.pk}'))
+
+    def get_next_link(self):
+        if self.keyset is None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        if not self.page:
+            return self.encode_cursor(self.cursor._replace(reverse=False))
+        return self.encode_position(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if self.keyset is None:
+            return super().get_previous_link()
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return self.encode_cursor(self.cursor._replace(reverse=True))
+        return self.encode_position(self.page[0], reverse=True)
+
+
+class CommentCursorPagination(CursorPagination):
+    ordering = ('-pub_date', '-id')
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+
+class FeedPagination(CursorPagination):
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+    def paginate_positions(self, request, get_page):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        positions, has_next = get_page(self.decode_position(request),
+                                       self.page_size)
+        self.next_position = positions[-1] if has_next else None
+        return positions
+
+    def decode_position(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            pub_date, pk = urlsafe_b64decode(
+                encoded.encode('ascii')).decode('ascii').split('|')
+            pub_date = parse_datetime(pub_date)
+            if pub_date is None:
+                raise ValueError
+            return pub_date, int(pk)
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        pub_date, pk = self.next_position
+        encoded = urlsafe_b64encode(
+            f'{pub_date.isoformat()}|{pk}'.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   encoded)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
@@ -0,0 +1,150 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Cart, Favourite, SimilarRecipe
+from .shopping_list import USER_LOCK_NAMESPACE
+
+SOURCES = (Favourite, Cart)
+BATCH_SIZE = 500
+LOCK_NAMESPACE = USER_LOCK_NAMESPACE + 1
+
+
+def chunks(items, size=BATCH_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def get_baskets(**filters):
+    baskets = defaultdict(set)
+    for model in SOURCES:
+        rows = model.objects.filter(**filters).values_list(
+            'user_id', 'recipe_id')
+        for user_id, recipe_id in rows.iterator():
+            baskets[user_id].add(recipe_id)
+    return baskets
+
+
+def get_popularity(baskets):
+    # The number of users with the recipe in any source, which is the norm
+    # of the same user vectors the co-occurrence counts come from. The
+    # stored counters would count a recipe that is both favourited and in
+    # the cart twice.
+    return Counter(recipe_id for basket in baskets.values()
+                   for recipe_id in basket)
+
+
+def lock():
+    # A refresh that overlaps a rebuild would store lists computed from
+    # the data it read before the rebuild replaced them.
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s, 0)',
+                       [LOCK_NAMESPACE])
+
+
+def count_pairs(baskets, recipe_ids=None):
+    pairs = defaultdict(Counter)
+    for basket in baskets.values():
+        # Users who favourite everything add little signal and a number of
+        # pairs quadratic in their basket size.
+        if len(basket) > settings.SIMILAR_RECIPES_MAX_BASKET:
+            continue
+        for recipe_id in basket:
+            if recipe_ids is None or recipe_id in recipe_ids:
+                pairs[recipe_id].update(basket)
+    return pairs
+
+
+def rank(pairs, popularity, recipe_ids):
+    """
+    Scores co-occurrence counts as cosine similarity of the recipes' user
+    vectors and keeps the best SIMILAR_RECIPES_COUNT per recipe.
+    """
+    similar = {}
+    for recipe_id in recipe_ids:
+        counts = pairs.get(recipe_id, {})
+        norm = max(popularity.get(recipe_id, 0), 1)
+        scored = (
+            (other, count / math.sqrt(norm * max(popularity[other], 1)))
+            for other, count in counts.items()
+            if other != recipe_id and other in popularity
+            and count >= settings.SIMILAR_RECIPES_MIN_SUPPORT
+        )
+        similar[recipe_id] = best(scored)
+    return similar
+
+
+def best(scored):
+    return heapq.nlargest(settings.SIMILAR_RECIPES_COUNT, scored,
+                          key=lambda item: (item[1], -item[0]))
+
+
+def store(similar):
+    for batch in chunks(similar):
+        SimilarRecipe.objects.filter(recipe__in=batch).delete()
+    SimilarRecipe.objects.bulk_create(
+        (SimilarRecipe(recipe_id=recipe_id, similar_id=other, score=score)
+         for recipe_id, items in similar.items()
+         for other, score in items),
+        batch_size=1000,
+    )
+
+
+@transaction.atomic
+def rebuild():
+    lock()
+    baskets = get_baskets()
+    pairs = count_pairs(baskets)
+    similar = rank(pairs, get_popularity(baskets), list(pairs))
+    SimilarRecipe.objects.all().delete()
+    store(similar)
+    return len(similar)
+
+
+def get_neighbours(similar):
+    # Similarity is symmetric, so the recomputed recipes may now also
+    # belong in their neighbours' lists.
+    neighbours = defaultdict(dict)
+    for recipe_id, items in similar.items():
+        for other, score in items:
+            if other not in similar:
+                neighbours[other][recipe_id] = score
+    for batch in chunks(neighbours):
+        stored = SimilarRecipe.objects.filter(recipe__in=batch).values_list(
+            'recipe_id', 'similar_id', 'score')
+        for recipe_id, other, score in stored:
+            neighbours[recipe_id].setdefault(other, score)
+    return {recipe_id: best(scores.items())
+            for recipe_id, scores in neighbours.items()}
+
+
+@transaction.atomic
+def refresh(since):
+    lock()
+    changed = set()
+    for model in SOURCES:
+        changed.update(model.objects.filter(
+            created__gte=since).values_list('recipe_id', flat=True))
+    users = set()
+    for batch in chunks(changed):
+        users.update(get_baskets(recipe__in=batch))
+    baskets = {}
+    for batch in chunks(users):
+        baskets.update(get_baskets(user__in=batch))
+    pairs = count_pairs(baskets, changed)
+    candidates = changed.union(*pairs.values())
+    popularity = Counter()
+    for batch in chunks(candidates):
+        popularity.update(get_popularity(get_baskets(recipe__in=batch)))
+    similar = rank(pairs, popularity,
+                   [recipe_id for recipe_id in changed
+                    if recipe_id in popularity])
+    similar.update(get_neighbours(similar))
+    store(similar)
+    return len(similar)
@@ -0,0 +1,109 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+from .models import IngredientsAmount, Recipe
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+executor = ThreadPoolExecutor(max_workers=1,
+                              thread_name_prefix='search-vectors')
+pending = threading.local()
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def weighted(expression, weight):
+    return SearchVector(expression, weight=weight,
+                        config=settings.RECIPE_SEARCH_CONFIG)
+
+
+def update_search_vectors(recipes):
+    if not is_supported():
+        return
+    from django.contrib.postgres.aggregates import StringAgg
+
+    ingredient_names = IngredientsAmount.objects.filter(
+        recipe=OuterRef('pk')
+    ).values('recipe').annotate(
+        names=StringAgg('ingredient__name', ' ')
+    ).values('names')
+    recipes.update(search_vector=(
+        weighted('name', 'A')
+        + weighted(Coalesce(Subquery(ingredient_names,
+                                     output_field=TextField()),
+                            Value('')), 'B')
+        + weighted('text', 'C')
+    ))
+
+
+def update_recipes(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        update_search_vectors(Recipe.objects.filter(
+            pk__in=recipe_ids[start:start + BATCH_SIZE]))
+
+
+def flush_pending():
+    recipe_ids, pending.recipe_ids = getattr(pending, 'recipe_ids', ()), set()
+    if recipe_ids:
+        update_recipes(recipe_ids)
+
+
+def update_on_commit(recipe_ids):
+    # A recipe edit saves the recipe and several ingredient rows, and each
+    # of them asks for the same vector. They are collected and the vector
+    # is computed once when the transaction commits.
+    if not is_supported():
+        return
+    pending.__dict__.setdefault('recipe_ids', set()).update(recipe_ids)
+    transaction.on_commit(flush_pending)
+
+
+def update_ingredient_recipes(ingredient_id):
+    try:
+        update_recipes(IngredientsAmount.objects.filter(
+            ingredient=ingredient_id).values_list('recipe', flat=True))
+    except Exception:
+        logger.exception('Could not update search vectors of recipes with '
+                         'ingredient %s', ingredient_id)
+    finally:
+        close_old_connections()
+
+
+def update_ingredient_later(ingredient_id):
+    if not is_supported():
+        return
+    transaction.on_commit(
+        lambda: executor.submit(update_ingredient_recipes, ingredient_id))
+
+
+def search(queryset, text):
+    text = text.strip()
+    if not text:
+        return queryset
+    if is_supported():
+        query = SearchQuery(text, config=settings.RECIPE_SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-pub_date', '-id')
+
+    for word in text.split():
+        queryset = queryset.filter(
+            Q(name__icontains=word)
+            | Q(text__icontains=word)
+            | Q(pk__in=IngredientsAmount.objects.filter(
+                ingredient__name__icontains=word).values('recipe'))
+        )
+    return queryset
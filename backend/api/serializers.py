@@ -2,14 +2,39 @@ import djoser.serializers
 import requests.exceptions
 from django.contrib.auth.password_validation import validate_password
 from django.core import exceptions as django_exceptions
+from django.db import transaction
 from djoser.conf import settings
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.serializers import SerializerMethodField
 from rest_framework.validators import UniqueTogetherValidator
 
+from . import images, shopping_list, uploads
 from .models import (Cart, Comment, Favourite, Follow, Ingredient,
                      IngredientsAmount, Recipe, Tag, User)
+from .search import update_on_commit
+
+
+def get_image_variants(recipe, request):
+    urls = images.get_variant_urls(recipe)
+    if urls is None or request is None:
+        return urls
+    return {
+        size: {extension: request.build_absolute_uri(url)
+               for extension, url in formats.items()}
+        for size, formats in urls.items()
+    }
+
+
+def get_recipes_limit(params):
+    recipes_limit = params.get("recipes_limit")
+    if recipes_limit is None:
+        return None
+    try:
+        return serializers.IntegerField(min_value=0).run_validation(
+            recipes_limit)
+    except serializers.ValidationError as error:
+        raise serializers.ValidationError({"recipes_limit": error.detail})
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -32,8 +57,11 @@ class UserSerializer(serializers.ModelSerializer):
             'email',
             'role',
             'is_subscribed',
-            'password'
+            'password',
+            'recipes_count',
+            'followers_count',
         )
+        read_only_fields = ('recipes_count', 'followers_count')
 
     def create(self, validated_data):
         user = User.objects.create_user(
@@ -47,6 +75,8 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         try:
             author = self.context.get("request").user
             if not author or author.is_anonymous:
@@ -59,11 +89,10 @@ class UserSerializer(serializers.ModelSerializer):
         try:
             recipes = Recipe.objects.filter(author=obj).order_by("-pub_date")
             params = self.context.get("request").query_params
-            recipes_limit = params.get("recipes_limit")
+            recipes_limit = get_recipes_limit(params)
             if not params:
                 return False
             elif recipes_limit is not None:
-                recipes_limit = int(recipes_limit)
                 recipes = recipes[:recipes_limit]
         except requests.exceptions.RequestException as exception:
             return exception.response
@@ -76,7 +105,7 @@ class UserSerializer(serializers.ModelSerializer):
         return serializer.data
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
+        return obj.recipes_count
 
 
 class PasswordSerializer(serializers.Serializer):
@@ -161,14 +190,6 @@ class IngredientSerializer(serializers.ModelSerializer):
             "measurement_unit",
         )
 
-    def to_internal_value(self, data):
-        try:
-            ingredient = Ingredient.objects.get(id=data)
-        except Ingredient.DoesNotExist:
-            raise serializers.ValidationError({f"An ingredient with id={data}"
-                                               f" does not exist."})
-        return ingredient
-
 
 class IngredientsRecipeReadSerializer(serializers.ModelSerializer):
     id = serializers.ReadOnlyField(source="ingredient.id")
@@ -188,6 +209,7 @@ class IngredientsRecipeReadSerializer(serializers.ModelSerializer):
 class RecipeReadSerializer(serializers.ModelSerializer):
     author = UserSerializer()
     image = serializers.SerializerMethodField('get_image')
+    image_variants = serializers.SerializerMethodField()
     ingredients = serializers.SerializerMethodField('get_ingredients')
     tags = TagSerializer(many=True, read_only=True)
     is_favorited = serializers.SerializerMethodField()
@@ -196,23 +218,28 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = ("id", "author", "name", "text", "ingredients", "tags",
-                  "image", "cooking_time", "is_favorited",
-                  "is_in_shopping_cart")
+                  "image", "image_variants", "cooking_time", "is_favorited",
+                  "is_in_shopping_cart", "favourites_count", "carts_count",
+                  "comments_count")
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, "is_favorited"):
+            return obj.is_favorited
         user = self.context["request"].user
         if user.is_anonymous:
             return False
         return Favourite.objects.filter(user=user, recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, "is_in_shopping_cart"):
+            return obj.is_in_shopping_cart
         user = self.context["request"].user
         if user.is_anonymous:
             return False
         return Cart.objects.filter(user=user, recipe=obj).exists()
 
     def get_ingredients(self, obj):
-        ingredients = IngredientsAmount.objects.filter(recipe=obj)
+        ingredients = obj.ingredient_amount.all()
         return IngredientsRecipeReadSerializer(ingredients, many=True).data
 
     def get_image(self, obj):
@@ -220,9 +247,12 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         photo_url = obj.image.url
         return request.build_absolute_uri(photo_url)
 
+    def get_image_variants(self, obj):
+        return get_image_variants(obj, self.context.get('request'))
+
 
 class IngredientsAmountSerializer(serializers.ModelSerializer):
-    id = IngredientSerializer()
+    id = serializers.IntegerField()
 
     class Meta:
         model = IngredientsAmount
@@ -231,7 +261,8 @@ class IngredientsAmountSerializer(serializers.ModelSerializer):
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     ingredients = IngredientsAmountSerializer(many=True)
-    image = Base64ImageField(max_length=300, use_url=True)
+    image = Base64ImageField(max_length=300, use_url=True, required=False)
+    image_upload = serializers.CharField(write_only=True, required=False)
     author = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
@@ -264,8 +295,31 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                     {"detail": "You cannot add the same"
                                " tags more than once."})
             existing_tags['tag'] = True
+        upload = data.pop("image_upload", None)
+        if upload is not None:
+            data["image"] = upload
+        elif self.instance is None and "image" not in data:
+            raise serializers.ValidationError(
+                {"image": "Send the image or an image_upload token."})
         return data
 
+    def validate_image_upload(self, token):
+        try:
+            return uploads.open_upload(token, self.context["request"].user)
+        except uploads.UploadError as error:
+            raise serializers.ValidationError(str(error))
+
+    def validate_ingredients(self, ingredients):
+        found = Ingredient.objects.in_bulk(
+            [ingredient["id"] for ingredient in ingredients])
+        for ingredient in ingredients:
+            if ingredient["id"] not in found:
+                raise serializers.ValidationError(
+                    f"An ingredient with id={ingredient['id']}"
+                    f" does not exist.")
+            ingredient["id"] = found[ingredient["id"]]
+        return ingredients
+
     def validate_cooking_time(self, data):
         if data <= 0:
             raise serializers.ValidationError(
@@ -273,6 +327,11 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             )
         return data
 
+    def discard_upload(self, validated_data):
+        image = validated_data.get("image")
+        if isinstance(image, uploads.ImageUpload):
+            transaction.on_commit(lambda: uploads.discard(image))
+
     def recipe_ingredients(self, validated_data, ingredients):
         data = ingredients
         recipe_ingredients = []
@@ -285,23 +344,53 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         IngredientsAmount.objects.bulk_create(recipe_ingredients)
         return validated_data
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop("tags")
         ingredients = validated_data.pop("ingredients")
+        self.discard_upload(validated_data)
 
         recipe = Recipe.objects.create(**validated_data,
                                        author=self.context["request"].user)
         recipe.tags.set(tags)
-        return self.recipe_ingredients(recipe, ingredients)
+        self.recipe_ingredients(recipe, ingredients)
+        update_on_commit([recipe.pk])
+        return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop("tags")
         ingredients = validated_data.pop("ingredients")
+        self.discard_upload(validated_data)
         super().update(instance, validated_data)
-        instance.save()
-        IngredientsAmount.objects.filter(recipe=instance).delete()
         instance.tags.set(tags)
-        return self.recipe_ingredients(instance, ingredients)
+
+        current = {item.ingredient_id: item
+                   for item in instance.ingredient_amount.all()}
+        old_amounts = {ingredient_id: item.amount
+                       for ingredient_id, item in current.items()}
+        new_amounts = {ingredient["id"].id: ingredient["amount"]
+                       for ingredient in ingredients}
+        removed = set(current) - set(new_amounts)
+        if removed:
+            IngredientsAmount.objects.filter(
+                recipe=instance, ingredient__in=removed).delete()
+        changed = []
+        for ingredient_id, amount in new_amounts.items():
+            item = current.get(ingredient_id)
+            if item is not None and item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        if changed:
+            IngredientsAmount.objects.bulk_update(changed, ["amount"])
+        self.recipe_ingredients(instance, [
+            ingredient for ingredient in ingredients
+            if ingredient["id"].id not in current
+        ])
+        shopping_list.recipe_ingredients_changed(
+            instance.id, old_amounts, new_amounts)
+        update_on_commit([instance.pk])
+        return instance
 
     def to_representation(self, instance):
         return RecipeReadSerializer(
@@ -311,11 +400,16 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
 
 class RecipeReadShortSerializer(serializers.ModelSerializer):
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = ["id", "name", "image", "cooking_time"]
+        fields = ["id", "name", "image", "image_variants", "cooking_time"]
         read_only_fields = ['name', 'image', 'cooking_time']
 
+    def get_image_variants(self, obj):
+        return get_image_variants(obj, self.context.get('request'))
+
 
 class FollowSerializer(serializers.ModelSerializer):
     class Meta:
@@ -339,20 +433,42 @@ class CartSerializer(serializers.ModelSerializer):
             "id": instance.recipe.id,
             "name": instance.recipe.name,
             "image": instance.recipe.image.url,
+            "image_variants": get_image_variants(
+                instance.recipe, self.context.get("request")),
             "cooking_time": instance.recipe.cooking_time,
         }
 
 
-class CommentSerializer(serializers.ModelSerializer):
-    author = serializers.SlugRelatedField(
-        read_only=True,
-        slug_field='username',
+class UserRecipeBulkSerializer(serializers.Serializer):
+    add = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        max_length=100,
     )
+    remove = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        max_length=100,
+    )
+
+    def validate(self, data):
+        add = set(data.get("add", []))
+        remove = set(data.get("remove", []))
+        if not add and not remove:
+            raise serializers.ValidationError(
+                {"detail": "Send recipe ids to add or remove."})
+        if add & remove:
+            raise serializers.ValidationError(
+                {"detail": "A recipe cannot be added and removed at once."})
+        return data
+
+
+class CommentSerializer(serializers.ModelSerializer):
+    author = serializers.ReadOnlyField(source='author.username')
 
     class Meta:
         fields = ('id', 'text', 'author', 'pub_date',)
         model = Comment
-        read_only_fields = ('review',)
 
 
 class CustomUserSerializer(djoser.serializers.UserSerializer):
@@ -366,6 +482,8 @@ class CustomUserSerializer(djoser.serializers.UserSerializer):
                   "is_subscribed", "recipes", "recipes_count"]
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         try:
             user = self.context.get("request").user
             if not user or user.is_anonymous:
@@ -376,15 +494,18 @@ class CustomUserSerializer(djoser.serializers.UserSerializer):
 
     def get_recipes(self, obj):
         try:
-            recipes = Recipe.objects.filter(author=obj).order_by("-pub_date")
-
             params = self.context.get("request").query_params
-            recipes_limit = params.get("recipes_limit")
             if not params:
                 return False
-            if recipes_limit is not None:
-                recipes_limit = int(recipes_limit)
-                recipes = recipes[:recipes_limit]
+            recipes_by_author = self.context.get("recipes_by_author")
+            if recipes_by_author is not None:
+                recipes = recipes_by_author.get(obj.id, [])
+            else:
+                recipes = Recipe.objects.filter(
+                    author=obj).order_by("-pub_date")
+                recipes_limit = get_recipes_limit(params)
+                if recipes_limit is not None:
+                    recipes = recipes[:recipes_limit]
 
             serializer = RecipeReadShortSerializer(
                 recipes,
@@ -396,4 +517,4 @@ class CustomUserSerializer(djoser.serializers.UserSerializer):
             return exception.response
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
+        return obj.recipes_count
@@ -0,0 +1,199 @@
+import csv
+import json
+
+from django.db import connection
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest
+
+from .models import Cart, IngredientsAmount, ShoppingListItem, User
+
+USER_LOCK_NAMESPACE = 1
+ADD_SQL = """
+INSERT INTO {table} (user_id, ingredient_id, amount)
+SELECT users.id, changes.ingredient_id, changes.amount
+FROM unnest(%s::integer[]) AS users (id)
+CROSS JOIN unnest(%s::integer[], %s::integer[])
+    AS changes (ingredient_id, amount)
+ON CONFLICT (user_id, ingredient_id)
+DO UPDATE SET amount = {table}.amount + EXCLUDED.amount
+"""
+
+
+def get_purchases(user):
+    return ShoppingListItem.objects.filter(user=user).order_by(
+        'ingredient__name'
+    ).values(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        'amount',
+    )
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def export_txt(purchases):
+    for item in purchases:
+        yield (f'{item["ingredient__name"]} - {item["amount"]} '
+               f'{item["ingredient__measurement_unit"]}\n')
+
+
+def export_csv(purchases):
+    writer = csv.writer(Echo())
+    yield writer.writerow(['name', 'amount', 'measurement_unit'])
+    for item in purchases:
+        yield writer.writerow([item['ingredient__name'], item['amount'],
+                               item['ingredient__measurement_unit']])
+
+
+def export_json(purchases):
+    separator = '\n'
+    yield '['
+    for item in purchases:
+        yield separator + json.dumps({
+            'name': item['ingredient__name'],
+            'amount': item['amount'],
+            'measurement_unit': item['ingredient__measurement_unit'],
+        }, ensure_ascii=False)
+        separator = ',\n'
+    yield '\n]\n'
+
+
+EXPORTERS = {
+    'txt': export_txt,
+    'csv': export_csv,
+    'json': export_json,
+}
+
+
+def get_live_purchases(user):
+    return IngredientsAmount.objects.filter(
+        recipe__to_cart__user=user
+    ).order_by('ingredient__name').values(
+        'ingredient__name',
+        'ingredient__measurement_unit'
+    ).annotate(amount=Sum('amount'))
+
+
+def recipe_amounts(recipe_ids):
+    return dict(IngredientsAmount.objects.filter(
+        recipe__in=recipe_ids
+    ).order_by().values('ingredient_id').annotate(
+        total=Sum('amount')
+    ).values_list('ingredient_id', 'total'))
+
+
+def lock_users(user_ids):
+    # Row locks on api_user would conflict with the key-share locks that
+    # foreign key checks take, so PostgreSQL uses advisory locks instead.
+    user_ids = sorted(set(user_ids))
+    if connection.vendor != 'postgresql':
+        list(User.objects.select_for_update().filter(
+            pk__in=user_ids).order_by('pk').values_list('pk', flat=True))
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_advisory_xact_lock(%s, user_id) FROM ('
+            'SELECT unnest(%s::integer[]) AS user_id ORDER BY 1) ids',
+            [USER_LOCK_NAMESPACE, user_ids],
+        )
+
+
+def add_amounts(user_ids, additions):
+    # A single upsert stays correct when two transactions add the same
+    # ingredient for a user that has no row for it yet.
+    with connection.cursor() as cursor:
+        cursor.execute(ADD_SQL.format(table=ShoppingListItem._meta.db_table), [
+            user_ids, list(additions), list(additions.values())])
+
+
+def apply_changes(user_ids, changes):
+    user_ids = sorted(set(user_ids))
+    changes = {key: value for key, value in changes.items() if value}
+    if not user_ids or not changes:
+        return
+    lock_users(user_ids)
+    additions = {}
+    for ingredient_id, delta in changes.items():
+        if delta > 0 and connection.vendor == 'postgresql':
+            additions[ingredient_id] = delta
+            continue
+        items = ShoppingListItem.objects.filter(
+            user__in=user_ids, ingredient=ingredient_id
+        )
+        items.update(amount=Greatest(F('amount') + delta, 0))
+        if delta > 0:
+            existing = set(items.values_list('user_id', flat=True))
+            ShoppingListItem.objects.bulk_create([
+                ShoppingListItem(user_id=user_id,
+                                 ingredient_id=ingredient_id,
+                                 amount=delta)
+                for user_id in user_ids if user_id not in existing
+            ])
+    if additions:
+        add_amounts(user_ids, additions)
+    ShoppingListItem.objects.filter(
+        user__in=user_ids, ingredient__in=changes, amount=0
+    ).delete()
+
+
+def add_recipes(user_id, recipe_ids):
+    apply_changes([user_id], recipe_amounts(recipe_ids))
+
+
+def remove_recipes(user_id, recipe_ids):
+    apply_changes([user_id], {
+        ingredient_id: -amount
+        for ingredient_id, amount in recipe_amounts(recipe_ids).items()
+    })
+
+
+def recipe_ingredients_changed(recipe_id, old_amounts, new_amounts):
+    changes = {
+        ingredient_id: (new_amounts.get(ingredient_id, 0)
+                        - old_amounts.get(ingredient_id, 0))
+        for ingredient_id in set(old_amounts) | set(new_amounts)
+    }
+    user_ids = Cart.objects.filter(
+        recipe=recipe_id).values_list('user_id', flat=True)
+    apply_changes(user_ids, changes)
+
+
+def find_drift(user_ids=None):
+    carts = {'recipe__to_cart__isnull': False}
+    stored = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        carts = {'recipe__to_cart__user__in': user_ids}
+        stored = stored.filter(user__in=user_ids)
+    live = IngredientsAmount.objects.filter(**carts).values(
+        'recipe__to_cart__user', 'ingredient'
+    ).annotate(total=Sum('amount'))
+    stored = stored.values_list('user_id', 'ingredient_id', 'amount')
+
+    expected = {(row['recipe__to_cart__user'], row['ingredient']):
+                row['total'] for row in live}
+    actual = {(user_id, ingredient_id): amount
+              for user_id, ingredient_id, amount in stored}
+
+    drift = []
+    for key in sorted(set(expected) | set(actual)):
+        if actual.get(key, 0) != expected.get(key, 0):
+            drift.append((*key, actual.get(key, 0), expected.get(key, 0)))
+    return drift
+
+
+def rebuild(user_ids):
+    user_ids = list(user_ids)
+    ShoppingListItem.objects.filter(user__in=user_ids).delete()
+    rows = IngredientsAmount.objects.filter(
+        recipe__to_cart__user__in=user_ids
+    ).values('recipe__to_cart__user', 'ingredient').annotate(
+        total=Sum('amount'))
+    ShoppingListItem.objects.bulk_create([
+        ShoppingListItem(user_id=row['recipe__to_cart__user'],
+                         ingredient_id=row['ingredient'],
+                         amount=row['total'])
+        for row in rows
+    ])
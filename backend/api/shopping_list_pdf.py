@@ -0,0 +1,152 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait as wait_for
+
+from django.conf import settings
+from django.template.loader import get_template
+from wkhtmltopdf.utils import render_pdf_from_template
+
+logger = logging.getLogger(__name__)
+
+READY = 'ready'
+PENDING = 'pending'
+FAILED = 'failed'
+
+TEMPLATE_NAME = 'shopping_cart.html'
+CMD_OPTIONS = {'margin-top': 50}
+PENDING_TIMEOUT = 5 * 60
+POLL_INTERVAL = 0.2
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.SHOPPING_LIST_PDF_WORKERS,
+    thread_name_prefix='shopping-list-pdf',
+)
+jobs = {}
+jobs_lock = threading.Lock()
+
+
+class QueueFullError(Exception):
+    pass
+
+
+def get_digest(purchases):
+    payload = json.dumps([TEMPLATE_NAME, CMD_OPTIONS, purchases],
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get_path(digest, suffix='pdf'):
+    return os.path.join(settings.SHOPPING_LIST_PDF_ROOT,
+                        f'{digest}.{suffix}')
+
+
+def get_owner_path(digest, user_id):
+    return get_path(digest, f'{user_id}.owner')
+
+
+def get_status(digest, user_id):
+    # Files are shared by users with identical lists, but a job is only
+    # visible to the users who submitted it.
+    if not re.fullmatch(r'[0-9a-f]{64}', digest):
+        return None
+    if not os.path.exists(get_owner_path(digest, user_id)):
+        return None
+    if os.path.exists(get_path(digest)):
+        return READY
+    if os.path.exists(get_path(digest, 'failed')):
+        return FAILED
+    try:
+        started = os.path.getmtime(get_path(digest, 'pending'))
+    except FileNotFoundError:
+        return None
+    if time.time() - started > PENDING_TIMEOUT:
+        return None
+    return PENDING
+
+
+def touch(path):
+    with open(path, 'w'):
+        pass
+
+
+def remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def render(purchases):
+    return render_pdf_from_template(
+        get_template(TEMPLATE_NAME), None, None,
+        context={'purchases': purchases},
+        cmd_options=CMD_OPTIONS,
+    )
+
+
+def store(digest, content):
+    os.makedirs(settings.SHOPPING_LIST_PDF_ROOT, exist_ok=True)
+    temporary_path = get_path(digest, f'{os.getpid()}.tmp')
+    with open(temporary_path, 'wb') as file:
+        file.write(content)
+    os.replace(temporary_path, get_path(digest))
+
+
+def render_to_cache(digest, purchases):
+    try:
+        store(digest, render(purchases))
+    except Exception:
+        logger.exception('Shopping list PDF %s failed to render', digest)
+        touch(get_path(digest, 'failed'))
+    finally:
+        remove(get_path(digest, 'pending'))
+
+
+def prune_cache():
+    expired = time.time() - settings.SHOPPING_LIST_PDF_MAX_AGE
+    with os.scandir(settings.SHOPPING_LIST_PDF_ROOT) as entries:
+        for entry in entries:
+            if entry.stat().st_mtime < expired:
+                remove(entry.path)
+
+
+def submit(purchases, user_id):
+    digest = get_digest(purchases)
+    os.makedirs(settings.SHOPPING_LIST_PDF_ROOT, exist_ok=True)
+    touch(get_owner_path(digest, user_id))
+    status = get_status(digest, user_id)
+    if status in (READY, PENDING):
+        return digest, status
+
+    with jobs_lock:
+        for key in [key for key, job in jobs.items() if job.done()]:
+            del jobs[key]
+        if digest in jobs:
+            return digest, PENDING
+        if len(jobs) >= settings.SHOPPING_LIST_PDF_QUEUE_SIZE:
+            raise QueueFullError
+        prune_cache()
+        remove(get_path(digest, 'failed'))
+        touch(get_path(digest, 'pending'))
+        jobs[digest] = executor.submit(render_to_cache, digest, purchases)
+    return digest, PENDING
+
+
+def wait(digest, user_id, timeout):
+    deadline = time.monotonic() + timeout
+    with jobs_lock:
+        job = jobs.get(digest)
+    if job is not None:
+        wait_for([job], timeout)
+    # Jobs submitted by another worker process are only visible on disk.
+    status = get_status(digest, user_id)
+    while status == PENDING and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        status = get_status(digest, user_id)
+    return status
@@ -0,0 +1,146 @@
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import feed, images, search, shopping_list, versions
+from .authentication import token_cache
+from .ingredient_index import ingredient_index
+from .models import (Cart, Comment, Favourite, Follow, Ingredient,
+                     IngredientsAmount, Recipe, Tag, User)
+
+
+def shift_counters(model, pks, field, delta):
+    model.objects.filter(pk__in=pks).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+    if model is User:
+        for pk in pks:
+            invalidate_tokens(pk)
+
+
+def invalidate_tokens(user_id):
+    # Before the commit another request could still read the old rows and
+    # cache them under the new version.
+    transaction.on_commit(lambda: token_cache.invalidate_user(user_id))
+
+
+def shift_counter(model, pk, field, delta):
+    shift_counters(model, [pk], field, delta)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        shift_counter(User, instance.author_id, 'recipes_count', 1)
+        feed.fan_out(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, **kwargs):
+    search.update_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, **kwargs):
+    if instance.image and not images.has_variants(instance):
+        transaction.on_commit(lambda: images.submit(instance.pk))
+
+
+@receiver(post_save, sender=IngredientsAmount)
+@receiver(post_delete, sender=IngredientsAmount)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    search.update_on_commit([instance.recipe_id])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    shift_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        shift_counter(User, instance.user_id, 'followers_count', 1)
+        feed.follow(instance.author_id, instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    shift_counter(User, instance.user_id, 'followers_count', -1)
+    feed.unfollow(instance.author_id, instance.user_id)
+
+
+@receiver(post_save, sender=Favourite)
+def favourite_created(sender, instance, created, **kwargs):
+    if created:
+        shift_counter(Recipe, instance.recipe_id, 'favourites_count', 1)
+
+
+@receiver(post_delete, sender=Favourite)
+def favourite_deleted(sender, instance, **kwargs):
+    shift_counter(Recipe, instance.recipe_id, 'favourites_count', -1)
+
+
+@receiver(post_save, sender=Cart)
+def cart_created(sender, instance, created, **kwargs):
+    if created:
+        shift_counter(Recipe, instance.recipe_id, 'carts_count', 1)
+        shopping_list.add_recipes(instance.user_id, [instance.recipe_id])
+
+
+@receiver(pre_delete, sender=Cart)
+def cart_deleting(sender, instance, **kwargs):
+    # pre_delete runs before a cascade removes the recipe's ingredients.
+    shopping_list.remove_recipes(instance.user_id, [instance.recipe_id])
+
+
+@receiver(post_delete, sender=Cart)
+def cart_deleted(sender, instance, **kwargs):
+    shift_counter(Recipe, instance.recipe_id, 'carts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        shift_counter(Recipe, instance.recipe_id, 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    shift_counter(Recipe, instance.recipe_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    transaction.on_commit(ingredient_index.invalidate)
+    versions.bump(versions.INGREDIENTS)
+    if not kwargs.get('created'):
+        search.update_ingredient_later(instance.pk)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    versions.bump(versions.TAGS)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    invalidate_tokens(instance.user_id)
+
+
+@receiver(user_logged_out)
+def user_signed_out(sender, user, **kwargs):
+    if user is not None:
+        invalidate_tokens(user.pk)
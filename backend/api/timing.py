@@ -0,0 +1,186 @@
+import functools
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+SLOWEST_SQL_LENGTH = 500
+
+local = threading.local()
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_class = None
+        self.action = None
+        self.queries = 0
+        self.db = 0.0
+        self.slowest = 0.0
+        self.slowest_sql = None
+        self.serializer = 0.0
+        self.serializer_depth = 0
+        self.view = 0.0
+        self.total = 0.0
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.db += duration
+            if duration >= self.slowest:
+                self.slowest = duration
+                self.slowest_sql = sql
+
+    def finish(self):
+        finished = time.perf_counter()
+        self.total = finished - self.started
+        if self.view_started is not None:
+            self.view = finished - self.view_started
+
+    def get_header(self):
+        metrics = [
+            ('db', self.db, f'{self.queries} queries'),
+            ('db-slowest', self.slowest, None),
+            ('serializer', self.serializer, None),
+            ('view', self.view, None),
+            ('total', self.total, None),
+        ]
+        return ', '.join(
+            f'{name};dur={duration * 1000:.1f}'
+            + (f';desc="{description}"' if description else '')
+            for name, duration, description in metrics
+        )
+
+    def as_dict(self, request, response):
+        return {
+            'view': self.view_class,
+            'action': self.action,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': self.queries,
+            'db_ms': round(self.db * 1000, 1),
+            'slowest_query_ms': round(self.slowest * 1000, 1),
+            'slowest_query': (self.slowest_sql or '')[:SLOWEST_SQL_LENGTH],
+            'serializer_ms': round(self.serializer * 1000, 1),
+            'view_ms': round(self.view * 1000, 1),
+            'total_ms': round(self.total * 1000, 1),
+        }
+
+
+def get_current():
+    return getattr(local, 'timings', None)
+
+
+@contextmanager
+def measure_serializer():
+    timings = get_current()
+    # Nested serializers and ListSerializer children are counted once,
+    # as part of the outermost call.
+    if timings is None or timings.serializer_depth:
+        yield
+        return
+    timings.serializer_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.serializer += time.perf_counter() - started
+        timings.serializer_depth -= 1
+
+
+def timed(method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with measure_serializer():
+            return method(*args, **kwargs)
+    wrapper.timed = True
+    return wrapper
+
+
+def instrument_serializers():
+    # Serializer.data and ListSerializer.data both end up in
+    # BaseSerializer.data, so these two cover every serializer.
+    if getattr(BaseSerializer.is_valid, 'timed', False):
+        return
+    BaseSerializer.is_valid = timed(BaseSerializer.is_valid)
+    BaseSerializer.data = property(timed(BaseSerializer.data.fget))
+
+
+def get_view_names(request, view_func):
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}', None
+    actions = getattr(view_func, 'actions', None) or {}
+    method = request.method.lower()
+    return view_class.__name__, actions.get(method, method)
+
+
+def should_log(timings):
+    return (timings.total * 1000 >= settings.REQUEST_TIMING_SLOW_MS
+            or random.random() < settings.REQUEST_TIMING_LOG_SAMPLE_RATE)
+
+
+@contextmanager
+def count_queries(timings):
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timings.execute))
+        yield
+
+
+def log(timings, request, response):
+    if should_log(timings):
+        logger.info(json.dumps(timings.as_dict(request, response)))
+
+
+def stream(timings, request, response, content):
+    # The body is generated after the middleware returns, so the queries
+    # and time it takes are only known once the stream is closed.
+    try:
+        with count_queries(timings):
+            yield from content
+    finally:
+        timings.finish()
+        log(timings, request, response)
+
+
+class RequestTimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = local.timings = RequestTimings()
+        try:
+            with count_queries(timings):
+                response = self.get_response(request)
+        finally:
+            local.timings = None
+        if response.streaming:
+            # Headers go out before the body, when no totals are known yet.
+            response.streaming_content = stream(
+                timings, request, response, response.streaming_content)
+            return response
+        timings.finish()
+        response['Server-Timing'] = timings.get_header()
+        log(timings, request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = get_current()
+        timings.view_class, timings.action = get_view_names(
+            request, view_func)
+        timings.view_started = time.perf_counter()
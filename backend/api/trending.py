@@ -0,0 +1,87 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Cart, Comment, Favourite, Recipe
+
+SOURCES = (
+    (Favourite, 'created', 'favourite'),
+    (Cart, 'created', 'cart'),
+    (Comment, 'pub_date', 'comment'),
+)
+EVENTS_SQL = """
+SELECT recipe_id, {field} AS happened, %s::float AS weight
+FROM {table} WHERE {field} >= %s
+"""
+UPDATE_SQL = """
+WITH events AS (
+    {events}
+), scores AS (
+    SELECT recipe_id, SUM(weight * POWER(
+        0.5, EXTRACT(EPOCH FROM %s - happened)::float / %s
+    )) AS score
+    FROM events
+    GROUP BY recipe_id
+), touched AS (
+    SELECT id FROM {recipe} WHERE trending_score > 0
+    UNION
+    SELECT recipe_id FROM scores
+)
+UPDATE {recipe} SET trending_score = COALESCE(scores.score, 0)
+FROM touched LEFT JOIN scores ON scores.recipe_id = touched.id
+WHERE {recipe}.id = touched.id
+"""
+
+
+def decay(age):
+    return 0.5 ** (age.total_seconds() / settings.TRENDING_HALF_LIFE)
+
+
+def update_sql(now, since):
+    events = []
+    params = []
+    for model, field, name in SOURCES:
+        events.append(EVENTS_SQL.format(table=model._meta.db_table,
+                                        field=field))
+        params += [settings.TRENDING_WEIGHTS[name], since]
+    with connection.cursor() as cursor:
+        cursor.execute(UPDATE_SQL.format(
+            events='UNION ALL'.join(events),
+            recipe=Recipe._meta.db_table,
+        ), params + [now, settings.TRENDING_HALF_LIFE])
+        return cursor.rowcount
+
+
+def update_orm(now, since):
+    scores = defaultdict(float)
+    for model, field, name in SOURCES:
+        weight = settings.TRENDING_WEIGHTS[name]
+        events = model.objects.filter(**{f'{field}__gte': since})
+        for recipe_id, happened in events.values_list(
+                'recipe_id', field).iterator():
+            scores[recipe_id] += weight * decay(now - happened)
+    touched = set(scores).union(Recipe.objects.filter(
+        trending_score__gt=0).values_list('pk', flat=True))
+    Recipe.objects.bulk_update(
+        [Recipe(pk=pk, trending_score=scores.get(pk, 0)) for pk in touched],
+        ['trending_score'],
+        batch_size=500,
+    )
+    return len(touched)
+
+
+def update():
+    """
+    Recalculates the trending score of every recipe with favourites, cart
+    additions or comments in the last TRENDING_WINDOW seconds. Each event
+    counts with its weight, halved every TRENDING_HALF_LIFE seconds.
+    """
+    now = timezone.now()
+    since = now - timedelta(seconds=settings.TRENDING_WINDOW)
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            return update_sql(now, since)
+        return update_orm(now, since)
@@ -0,0 +1,138 @@
+import os
+import tempfile
+import time
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from PIL import Image
+
+CHUNK_SIZE = 64 * 1024
+TOKEN_SALT = 'api.uploads'
+FORMATS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'WEBP': 'webp',
+}
+
+
+class UploadError(Exception):
+    pass
+
+
+class UploadTooLargeError(UploadError):
+    pass
+
+
+class ImageUpload(File):
+    pass
+
+
+def get_path(name):
+    return os.path.join(settings.RECIPE_IMAGE_UPLOAD_ROOT, name)
+
+
+def check_size(size):
+    if size > settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE:
+        raise UploadTooLargeError(
+            f'The image must not be larger than '
+            f'{settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE} bytes.')
+
+
+def write_chunks(chunks):
+    os.makedirs(settings.RECIPE_IMAGE_UPLOAD_ROOT, exist_ok=True)
+    descriptor, path = tempfile.mkstemp(
+        dir=settings.RECIPE_IMAGE_UPLOAD_ROOT, suffix='.tmp')
+    written = 0
+    try:
+        with os.fdopen(descriptor, 'wb') as destination:
+            for chunk in chunks:
+                written += len(chunk)
+                check_size(written)
+                destination.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def read_stream(stream):
+    chunk = stream.read(CHUNK_SIZE)
+    while chunk:
+        yield chunk
+        chunk = stream.read(CHUNK_SIZE)
+
+
+def inspect(path):
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+            if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+                raise UploadError(
+                    f'The image must not have more than '
+                    f'{settings.RECIPE_IMAGE_MAX_PIXELS} pixels.')
+            if image.format not in FORMATS:
+                raise UploadError(
+                    f'Unsupported image format: {image.format}.')
+            image_format = image.format
+            image.verify()
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise UploadError('The file is not a valid image.')
+    return image_format, width, height
+
+
+def prune():
+    oldest = time.time() - settings.RECIPE_IMAGE_UPLOAD_MAX_AGE
+    try:
+        entries = list(os.scandir(settings.RECIPE_IMAGE_UPLOAD_ROOT))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if entry.is_file() and entry.stat().st_mtime < oldest:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+def store(chunks, user):
+    prune()
+    path = write_chunks(chunks)
+    try:
+        image_format, width, height = inspect(path)
+    except UploadError:
+        os.remove(path)
+        raise
+    name = f'{uuid.uuid4()}.{FORMATS[image_format]}'
+    os.replace(path, get_path(name))
+    return {
+        'token': signing.dumps({'name': name, 'user': user.pk},
+                               salt=TOKEN_SALT),
+        'width': width,
+        'height': height,
+        'format': image_format.lower(),
+    }
+
+
+def open_upload(token, user):
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT,
+                             max_age=settings.RECIPE_IMAGE_UPLOAD_MAX_AGE)
+    except signing.BadSignature:
+        raise UploadError('The upload token is invalid or has expired.')
+    if data['user'] != user.pk:
+        raise UploadError('The upload token is invalid or has expired.')
+    try:
+        return ImageUpload(open(get_path(data['name']), 'rb'),
+                           name=data['name'])
+    except FileNotFoundError:
+        raise UploadError('The upload token has already been used.')
+
+
+def discard(upload):
+    upload.close()
+    try:
+        os.remove(upload.file.name)
+    except FileNotFoundError:
+        pass
@@ -1,9 +1,12 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from .models import Cart, Favourite
 from .views import (CartViewSet, CommentViewSet, DownloadShoppingCart,
-                    IngredientViewSet, RecipeViewSet, SubscriptionsViewSet,
-                    TagViewSet, UserViewSet)
+                    IngredientViewSet, RecipeImageUpload, RecipeViewSet,
+                    ShoppingCartPdfJob, ShoppingCartPdfJobFile,
+                    ShoppingCartPdfJobs, SubscriptionsViewSet, TagViewSet,
+                    UserRecipeBulkView, UserViewSet)
 
 v1_router = DefaultRouter()
 v1_router.register('users', UserViewSet, basename='users'),
@@ -30,9 +33,30 @@ urlpatterns = [
          CartViewSet.as_view({'get': 'create',
                               'delete': 'destroy'}),
          name='shopping_cart'),
+    path('recipes/favorite/bulk/',
+         UserRecipeBulkView.as_view(model=Favourite),
+         name='favorite_bulk'),
+    path('recipes/shopping_cart/bulk/',
+         UserRecipeBulkView.as_view(model=Cart),
+         name='shopping_cart_bulk'),
+    path('recipes/images/',
+         RecipeImageUpload.as_view(),
+         name='recipe_images'),
     path('recipes/download_shopping_cart/',
          DownloadShoppingCart.as_view(),
          name='shopping_cart_list'),
+    path('recipes/download_shopping_cart/pdf/',
+         CartViewSet.as_view({'get': 'list'}),
+         name='shopping_cart_pdf'),
+    path('recipes/download_shopping_cart/pdf/jobs/',
+         ShoppingCartPdfJobs.as_view(),
+         name='shopping_cart_pdf_jobs'),
+    path('recipes/download_shopping_cart/pdf/jobs/<str:job>/',
+         ShoppingCartPdfJob.as_view(),
+         name='shopping_cart_pdf_job'),
+    path('recipes/download_shopping_cart/pdf/jobs/<str:job>/file/',
+         ShoppingCartPdfJobFile.as_view(),
+         name='shopping_cart_pdf_job_file'),
     path('users/<int:author_id>/subscribe/',
          SubscriptionsViewSet.as_view({'get': 'create',
                                        'delete': 'destroy'}),
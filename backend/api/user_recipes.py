@@ -0,0 +1,168 @@
+from contextlib import contextmanager
+
+from django.db import IntegrityError, connection, transaction
+
+from . import shopping_list
+from .models import Cart, Favourite, Recipe
+from .signals import shift_counters
+
+ADDED = 'added'
+REMOVED = 'removed'
+UNCHANGED = 'unchanged'
+NOT_FOUND = 'not_found'
+
+COUNTERS = {
+    Favourite: 'favourites_count',
+    Cart: 'carts_count',
+}
+AFTER_ADD = {
+    Cart: shopping_list.add_recipes,
+}
+AFTER_REMOVE = {
+    Cart: shopping_list.remove_recipes,
+}
+RECIPE_COLUMNS = ('id', 'name', 'image', 'cooking_time',
+                  'image_variants_source')
+
+ADD_SQL = """
+WITH changed AS (
+    INSERT INTO {table} (user_id, recipe_id, created)
+    SELECT %s, id, now() FROM {recipes} WHERE id = ANY(%s)
+    ON CONFLICT (user_id, recipe_id) DO NOTHING
+    RETURNING recipe_id
+)
+UPDATE {recipes} SET {counter} = {counter} + 1
+FROM changed WHERE {recipes}.id = changed.recipe_id
+RETURNING {columns}
+"""
+REMOVE_SQL = """
+WITH changed AS (
+    DELETE FROM {table} WHERE user_id = %s AND recipe_id = ANY(%s)
+    RETURNING recipe_id
+)
+UPDATE {recipes} SET {counter} = GREATEST({counter} - 1, 0)
+FROM changed WHERE {recipes}.id = changed.recipe_id
+RETURNING {columns}
+"""
+
+
+def is_atomic_sql_supported():
+    return connection.vendor == 'postgresql'
+
+
+def get_sql(template, model):
+    recipes = Recipe._meta.db_table
+    return template.format(
+        table=model._meta.db_table,
+        recipes=recipes,
+        counter=COUNTERS[model],
+        columns=', '.join(f'{recipes}.{column}'
+                          for column in RECIPE_COLUMNS),
+    )
+
+
+def change(template, model, user, recipe_ids):
+    if not recipe_ids:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(get_sql(template, model), [user.pk, list(recipe_ids)])
+        rows = cursor.fetchall()
+    return [Recipe(**dict(zip(RECIPE_COLUMNS, row))) for row in rows]
+
+
+def lock_user(user):
+    shopping_list.lock_users([user.pk])
+
+
+@contextmanager
+def hooked(hooks, model, user):
+    if model not in hooks:
+        yield
+        return
+    with transaction.atomic():
+        lock_user(user)
+        yield
+
+
+def run_hook(hooks, model, user, recipe_ids):
+    if model in hooks and recipe_ids:
+        hooks[model](user.pk, recipe_ids)
+
+
+def add_one(model, user, recipe_id):
+    if not is_atomic_sql_supported():
+        recipe = Recipe.objects.filter(pk=recipe_id).first()
+        if recipe is None:
+            return None
+        try:
+            with transaction.atomic():
+                model.objects.create(user=user, recipe=recipe)
+        except IntegrityError:
+            return None
+        return recipe
+    with hooked(AFTER_ADD, model, user):
+        recipes = change(ADD_SQL, model, user, [recipe_id])
+        run_hook(AFTER_ADD, model, user, [recipe.pk for recipe in recipes])
+    return recipes[0] if recipes else None
+
+
+def remove_one(model, user, recipe_id):
+    if not is_atomic_sql_supported():
+        deleted, _ = model.objects.filter(
+            user=user, recipe=recipe_id).delete()
+        return bool(deleted)
+    with hooked(AFTER_REMOVE, model, user):
+        recipes = change(REMOVE_SQL, model, user, [recipe_id])
+        run_hook(AFTER_REMOVE, model, user, [recipe.pk for recipe in recipes])
+    return bool(recipes)
+
+
+def add(model, user, recipe_ids):
+    found = set(Recipe.objects.filter(
+        pk__in=recipe_ids).values_list('pk', flat=True))
+    if is_atomic_sql_supported():
+        added = {recipe.pk for recipe in change(ADD_SQL, model, user, found)}
+    else:
+        existing = set(model.objects.filter(
+            user=user, recipe__in=found).values_list('recipe_id', flat=True))
+        added = found - existing
+        model.objects.bulk_create(
+            [model(user=user, recipe_id=recipe_id) for recipe_id in added],
+            ignore_conflicts=True,
+        )
+        shift_counters(Recipe, added, COUNTERS[model], 1)
+    run_hook(AFTER_ADD, model, user, added)
+    return {
+        recipe_id: (ADDED if recipe_id in added
+                    else UNCHANGED if recipe_id in found
+                    else NOT_FOUND)
+        for recipe_id in recipe_ids
+    }
+
+
+def remove(model, user, recipe_ids):
+    if is_atomic_sql_supported():
+        removed = {recipe.pk
+                   for recipe in change(REMOVE_SQL, model, user, recipe_ids)}
+        run_hook(AFTER_REMOVE, model, user, removed)
+    else:
+        rows = model.objects.filter(user=user, recipe__in=recipe_ids)
+        removed = set(rows.values_list('recipe_id', flat=True))
+        # The delete receivers shift the counters and update the shopping
+        # list, the same as for a single removal.
+        rows.delete()
+    return {
+        recipe_id: REMOVED if recipe_id in removed else UNCHANGED
+        for recipe_id in recipe_ids
+    }
+
+
+@transaction.atomic
+def apply(model, user, add_ids=(), remove_ids=()):
+    lock_user(user)
+    results = {}
+    if remove_ids:
+        results.update(remove(model, user, remove_ids))
+    if add_ids:
+        results.update(add(model, user, add_ids))
+    return results
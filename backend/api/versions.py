@@ -0,0 +1,74 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .models import ReferenceVersion
+
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+CACHE_KEY = 'reference-version:{}'
+
+
+def load(name):
+    version = ReferenceVersion.objects.get_or_create(name=name)[0]
+    return version.version, version.updated_at
+
+
+def publish(name):
+    # Runs after the commit, so the row read here is at least as new as
+    # the bump. A slower publish of an older bump must not overwrite it.
+    stamp = load(name)
+    cached = cache.get(CACHE_KEY.format(name))
+    if cached is None or cached[0] < stamp[0]:
+        cache.set(CACHE_KEY.format(name), stamp,
+                  timeout=settings.REFERENCE_VERSION_CACHE_TTL)
+
+
+def bump(name):
+    updated = ReferenceVersion.objects.filter(name=name).update(
+        version=F('version') + 1, updated_at=timezone.now())
+    if not updated:
+        ReferenceVersion.objects.get_or_create(name=name)
+    transaction.on_commit(lambda: publish(name))
+
+
+def get_stamp(name):
+    # The table is only read when the shared cache has no stamp. add()
+    # leaves a stamp published by a concurrent bump in place.
+    key = CACHE_KEY.format(name)
+    stamp = cache.get(key)
+    if stamp is None:
+        stamp = load(name)
+        cache.add(key, stamp, timeout=settings.REFERENCE_VERSION_CACHE_TTL)
+    version, updated_at = stamp
+    return ReferenceVersion(name=name, version=version,
+                            updated_at=updated_at)
+
+
+def get_version(request, name):
+    if request is None:
+        return get_stamp(name)
+    versions = request.__dict__.setdefault('_reference_versions', {})
+    if name not in versions:
+        versions[name] = get_stamp(name)
+    return versions[name]
+
+
+def reference_data_condition(name):
+    def etag(request, *args, **kwargs):
+        version = get_version(request, name)
+        variant = hashlib.md5('\n'.join((
+            request.get_full_path(),
+            request.META.get('HTTP_ACCEPT', ''),
+        )).encode()).hexdigest()
+        return f'{name}-{version.version}-{variant}'
+
+    def last_modified(request, *args, **kwargs):
+        return get_version(request, name).updated_at.replace(microsecond=0)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
@@ -1,30 +1,45 @@
+from functools import partial
+from io import BytesIO
+
 import djoser
+from django.conf import settings
 from django.contrib.auth import update_session_auth_hash
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.template.loader import get_template
+from django.db.models import BooleanField, Exists, OuterRef, Prefetch, Value
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.decorators import method_decorator
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser import utils
 from djoser.compat import get_user_email
 from rest_framework import filters, permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.mixins import (CreateModelMixin, DestroyModelMixin,
                                    ListModelMixin, RetrieveModelMixin)
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from wkhtmltopdf.views import PDFTemplateResponse
 
-from .filters import IngredientFilter, RecipeFilter
-from .models import (Cart, Favourite, Follow, Ingredient, IngredientsAmount,
-                     Recipe, Tag, User)
+from . import feed, shopping_list_pdf, uploads, user_recipes
+from .filters import RecipeFilter
+from .ingredient_index import ingredient_index
+from .models import (Cart, Comment, Favourite, Follow, Ingredient,
+                     IngredientsAmount, Recipe, Tag, User)
+from .pagination import (CommentCursorPagination, FeedPagination,
+                         RecipeCursorPagination)
 from .permissions import IsAdministratorOrReadOnly, IsAuthorOrAdminOrModerator
+from .renderers import CSVRenderer, PlainTextRenderer
 from .serializers import (CartSerializer, CommentSerializer,
                           CustomUserSerializer, FollowSerializer,
                           IngredientSerializer, RecipeCreateSerializer,
-                          RecipeReadSerializer, TagSerializer, UserSerializer)
+                          RecipeReadSerializer, RecipeReadShortSerializer,
+                          TagSerializer, UserRecipeBulkSerializer,
+                          UserSerializer, get_recipes_limit)
+from .shopping_list import EXPORTERS, get_purchases
+from .versions import INGREDIENTS, TAGS, get_version, reference_data_condition
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -71,6 +86,8 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+@method_decorator(reference_data_condition(TAGS), name='list')
+@method_decorator(reference_data_condition(TAGS), name='retrieve')
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
     queryset = Tag.objects.all()
@@ -78,19 +95,69 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (IsAdministratorOrReadOnly,)
 
 
+@method_decorator(reference_data_condition(INGREDIENTS), name='list')
+@method_decorator(reference_data_condition(INGREDIENTS), name='retrieve')
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
     permission_classes = (IsAuthorOrAdminOrModerator,
                           )
-    filterset_class = IngredientFilter
+
+    def get_limit(self, request):
+        limit = request.query_params.get('limit')
+        if not limit:
+            return None
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            raise ValidationError(
+                {'limit': ['Ensure this value is a positive integer.']})
+        return min(limit, settings.INGREDIENT_SEARCH_MAX_LIMIT)
+
+    def list(self, request, *args, **kwargs):
+        ingredients = ingredient_index.search(
+            request.query_params.get('name', ''),
+            limit=self.get_limit(request),
+            version=get_version(request, INGREDIENTS).version,
+        )
+        return Response(ingredients)
+
+
+def annotate_is_subscribed(queryset, user):
+    if user.is_anonymous:
+        return queryset.annotate(
+            is_subscribed=Value(False, output_field=BooleanField()))
+    return queryset.annotate(is_subscribed=Exists(
+        Follow.objects.filter(author=user, user=OuterRef('pk'))))
+
+
+def toggle_user_recipe(request, model, recipe_id,
+                       missing_status=status.HTTP_404_NOT_FOUND):
+    try:
+        recipe_id = int(recipe_id)
+    except (TypeError, ValueError):
+        raise Http404
+    if request.method == 'DELETE':
+        if user_recipes.remove_one(model, request.user, recipe_id):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response({'detail': 'Action already completed'},
+                        status=missing_status)
+
+    recipe = user_recipes.add_one(model, request.user, recipe_id)
+    if recipe is None:
+        get_object_or_404(Recipe, id=recipe_id)
+        return Response({'detail': 'Action already completed'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    serializer = RecipeReadShortSerializer(recipe,
+                                           context={'request': request})
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.select_related('author').prefetch_related(
-        'ingredients'
-    ).all()
+    queryset = Recipe.objects.all()
     pagination_class = PageNumberPagination
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,
                           IsAuthorOrAdminOrModerator,
@@ -98,11 +165,47 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    @property
+    def paginator(self):
+        cursor_mode = (
+            self.pagination_class is not None
+            and self.request.query_params.get('pagination') == 'cursor'
+        )
+        if cursor_mode and not hasattr(self, '_paginator'):
+            self._paginator = RecipeCursorPagination()
+        return super().paginator
+
+    def get_queryset(self):
+        user = self.request.user
+        if self.action not in ["list", "retrieve", "feed"]:
+            return self.queryset
+        return self.queryset.with_user_flags(user).prefetch_related(
+            Prefetch('author', queryset=annotate_is_subscribed(
+                User.objects.all(), user)),
+            Prefetch('ingredient_amount',
+                     queryset=IngredientsAmount.objects.select_related(
+                         'ingredient')),
+            'tags',
+        )
+
     def get_serializer_class(self):
-        if self.action in ["list", "retrieve"]:
+        if self.action in ["list", "retrieve", "feed"]:
             return RecipeReadSerializer
         return RecipeCreateSerializer
 
+    @action(
+        detail=False,
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def feed(self, request):
+        paginator = FeedPagination()
+        positions = paginator.paginate_positions(
+            request, partial(feed.get_page, request.user))
+        recipes = self.get_queryset().filter(
+            pk__in=[pk for _, pk in positions])
+        serializer = self.get_serializer(recipes, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     @action(
         detail=True,
         methods=['get', 'delete'],
@@ -110,24 +213,22 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=[permissions.IsAuthenticated]
     )
     def favorite(self, request, pk):
-        user = request.user
-        recipe = get_object_or_404(Recipe, id=pk,)
-        like = recipe.favourites.filter(user=user)
-
-        if request.method == 'GET' and not like:
-            serializer = self.get_serializer(recipe)
-            Favourite.objects.create(user=user, recipe=recipe)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-        if request.method == 'DELETE' and like:
-            serializer = self.get_serializer(recipe)
-            Favourite.objects.get(user=user, recipe=recipe).delete()
-            return Response(serializer.data, status=status.HTTP_204_NO_CONTENT)
-
-        return Response(
-            {'detail': 'Action already completed'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
+        return toggle_user_recipe(request, Favourite, pk,
+                                  missing_status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, pagination_class=None)
+    def similar(self, request, pk):
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise Http404
+        recipes = list(Recipe.objects.filter(similar_to__recipe=pk).order_by(
+            '-similar_to__score', 'pk').only(*user_recipes.RECIPE_COLUMNS))
+        if not recipes:
+            get_object_or_404(Recipe, pk=pk)
+        serializer = RecipeReadShortSerializer(recipes, many=True,
+                                               context={'request': request})
+        return Response(serializer.data)
 
 
 class UserRecipeConnectViewSet(viewsets.GenericViewSet, CreateModelMixin,
@@ -137,23 +238,12 @@ class UserRecipeConnectViewSet(viewsets.GenericViewSet, CreateModelMixin,
     permission_classes = (IsAuthenticated,)
 
     def create(self, request, *args, **kwargs):
-        data = request.data
-        data["user"] = request.user.id
-        data["recipe"] = kwargs.get("recipe_id")
-
-        serializer = self.get_serializer(data=data)
-        serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
-        headers = self.get_success_headers(serializer.validated_data)
-        return Response(serializer.data, status=status.HTTP_201_CREATED,
-                        headers=headers)
+        return toggle_user_recipe(request, self.Meta.model,
+                                  kwargs.get("recipe_id"))
 
     def destroy(self, request, *args, **kwargs):
-        instance = get_object_or_404(self.Meta.model,
-                                     user=request.user.id,
-                                     recipe=kwargs.get("recipe_id"))
-        self.perform_destroy(instance)
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        return toggle_user_recipe(request, self.Meta.model,
+                                  kwargs.get("recipe_id"))
 
 
 class SubscriptionsViewSet(viewsets.ModelViewSet):
@@ -167,7 +257,33 @@ class SubscriptionsViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        return User.objects.filter(follower__author=user).order_by("id")
+        queryset = User.objects.filter(follower__author=user).order_by("id")
+        return annotate_is_subscribed(queryset, user)
+
+    def get_recipes_by_author(self, authors):
+        recipes = Recipe.objects.filter(author__in=authors)
+        recipes_limit = get_recipes_limit(self.request.query_params)
+        if recipes_limit is not None:
+            recipes = recipes.latest_per_author(recipes_limit)
+        recipes_by_author = {author.id: [] for author in authors}
+        for recipe in recipes:
+            recipes_by_author[recipe.author_id].append(recipe)
+        return recipes_by_author
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        authors = list(queryset) if page is None else page
+
+        context = self.get_serializer_context()
+        if request.query_params:
+            context["recipes_by_author"] = self.get_recipes_by_author(authors)
+        serializer = self.get_serializer_class()(
+            authors, many=True, context=context
+        )
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
 
     def create(self, request, *args, **kwargs):
         data = request.data
@@ -190,6 +306,27 @@ class SubscriptionsViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+def pdf_queue_full_response():
+    return Response(
+        {'detail': 'Too many shopping lists are being rendered'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': '5'},
+    )
+
+
+def pdf_job_response(digest, job_status):
+    response_status = {
+        shopping_list_pdf.READY: status.HTTP_200_OK,
+        shopping_list_pdf.PENDING: status.HTTP_202_ACCEPTED,
+    }.get(job_status, status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return Response(
+        {'job': digest, 'status': job_status},
+        status=response_status,
+        headers={'Location': reverse('shopping_cart_pdf_job',
+                                     args=[digest])},
+    )
+
+
 class CartViewSet(UserRecipeConnectViewSet,
                   ListModelMixin):
     queryset = Cart.objects.order_by("-recipe__pub_date")
@@ -199,49 +336,126 @@ class CartViewSet(UserRecipeConnectViewSet,
         model = Cart
 
     def get_purchases(self, request):
-        ingredients = IngredientsAmount.objects.filter(
-            recipe__to_cart__user=request.user.id
-        ).select_related('ingredient')
-        purchases = ingredients.values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-
-        return purchases
+        return get_purchases(request.user)
 
     def list(self, request, *args, **kwargs):
-        template = get_template("shopping_cart.html")
-        responce = PDFTemplateResponse(
-            request=request,
-            template=template,
+        purchases = list(self.get_purchases(request))
+        try:
+            digest, job_status = shopping_list_pdf.submit(
+                purchases, request.user.pk)
+        except shopping_list_pdf.QueueFullError:
+            return pdf_queue_full_response()
+        job_status = shopping_list_pdf.wait(
+            digest, request.user.pk, settings.SHOPPING_LIST_PDF_WAIT)
+        if job_status != shopping_list_pdf.READY:
+            return pdf_job_response(digest, job_status)
+        return FileResponse(
+            open(shopping_list_pdf.get_path(digest), 'rb'),
+            as_attachment=True,
             filename="shopping_cart.pdf",
-            context={"purchases": self.get_purchases(request)},
-            show_content_in_browser=False,
-            cmd_options={'margin-top': 50, },
+            content_type="application/pdf",
         )
-        return responce
+
+
+class UserRecipeBulkView(APIView):
+    permission_classes = (IsAuthenticated,)
+    model = None
+
+    def post(self, request):
+        serializer = UserRecipeBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        add_ids = list(dict.fromkeys(serializer.validated_data.get('add', [])))
+        remove_ids = list(dict.fromkeys(
+            serializer.validated_data.get('remove', [])))
+        results = user_recipes.apply(self.model, request.user,
+                                     add_ids, remove_ids)
+        return Response({'results': [
+            {'id': recipe_id, 'status': results[recipe_id]}
+            for recipe_id in remove_ids + add_ids
+        ]})
+
+
+class ShoppingCartPdfJobs(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        purchases = list(get_purchases(request.user))
+        try:
+            digest, job_status = shopping_list_pdf.submit(
+                purchases, request.user.pk)
+        except shopping_list_pdf.QueueFullError:
+            return pdf_queue_full_response()
+        return pdf_job_response(digest, job_status)
+
+
+class ShoppingCartPdfJob(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, job):
+        job_status = shopping_list_pdf.get_status(job, request.user.pk)
+        if job_status is None:
+            raise Http404
+        return Response({'job': job, 'status': job_status})
+
+
+class ShoppingCartPdfJobFile(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, job):
+        if (shopping_list_pdf.get_status(job, request.user.pk)
+                != shopping_list_pdf.READY):
+            raise Http404
+        return FileResponse(
+            open(shopping_list_pdf.get_path(job), 'rb'),
+            as_attachment=True,
+            filename="shopping_cart.pdf",
+            content_type="application/pdf",
+        )
+
+
+class RecipeImageUpload(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        try:
+            uploads.check_size(int(request.META.get('CONTENT_LENGTH') or 0))
+            if request.content_type.startswith('multipart/form-data'):
+                image = request.FILES.get('image')
+                if image is None:
+                    return Response(
+                        {'image': ['No file was submitted.']},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                chunks = image.chunks(uploads.CHUNK_SIZE)
+            else:
+                chunks = uploads.read_stream(request.stream or BytesIO())
+            upload = uploads.store(chunks, request.user)
+        except uploads.UploadTooLargeError as error:
+            return Response(
+                {'detail': str(error)},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        except uploads.UploadError as error:
+            return Response({'detail': str(error)},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(upload, status=status.HTTP_201_CREATED)
 
 
 class DownloadShoppingCart(APIView):
     permission_classes = (IsAuthenticated,)
+    renderer_classes = (PlainTextRenderer, CSVRenderer, JSONRenderer)
+    chunk_size = 500
 
     def get(self, request):
-        ingredients = IngredientsAmount.objects.filter(
-            recipe__to_cart__user=request.user.id
-        ).select_related('ingredient')
-        purchases = ingredients.values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-
-        wishlist = []
-        for item in purchases:
-            wishlist.append(f'{item["ingredient__name"]} - {item["amount"]} '
-                            f'{item["ingredient__measurement_unit"]} \n')
-
-        response = HttpResponse(wishlist, 'Content-Type: text/plain')
-        response['Content-Disposition'] = ('attachment; '
-                                           'filename="wishlist.txt"')
+        renderer = request.accepted_renderer
+        purchases = get_purchases(request.user).iterator(
+            chunk_size=self.chunk_size)
+        response = StreamingHttpResponse(
+            EXPORTERS[renderer.format](purchases),
+            content_type=f'{renderer.media_type}; charset=utf-8',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="wishlist.{renderer.format}"')
         return response
 
 
@@ -250,18 +464,22 @@ class CommentViewSet(viewsets.ModelViewSet):
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,
                           IsAuthorOrAdminOrModerator,
                           )
-    pagination_class = PageNumberPagination
+    pagination_class = CommentCursorPagination
 
     def get_queryset(self):
-        return get_object_or_404(
-            Recipe.objects.filter(title_id=self.kwargs.get('title_id')),
-            pk=self.kwargs.get('review_id')
-        ).comments.all()
+        return Comment.objects.filter(
+            recipe=self.kwargs['recipes_id']).select_related('author')
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if (not response.data['results']
+                and not Recipe.objects.filter(
+                    pk=self.kwargs['recipes_id']).exists()):
+            raise Http404
+        return response
 
     def perform_create(self, serializer):
         serializer.save(
             author=self.request.user,
-            review=get_object_or_404(
-                Recipe.objects.filter(title_id=self.kwargs.get('title_id')),
-                pk=self.kwargs.get('review_id'))
+            recipe=get_object_or_404(Recipe, pk=self.kwargs['recipes_id']),
         )
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -31,11 +32,47 @@ INSTALLED_APPS = [
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'api.cache.SharedMemoryCache',
+        'LOCATION': os.path.join(
+            '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+            'foodgram-cache'
+        ),
+        'OPTIONS': {
+            'SLOTS': 2048,
+            'SLOT_SIZE': 16 * 1024,
+        },
     }
 }
 
+INGREDIENT_INDEX_TTL = 300
+INGREDIENT_SEARCH_MAX_LIMIT = 100
+REFERENCE_VERSION_CACHE_TTL = 600
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 60
+
+REQUEST_TIMING_LOG_SAMPLE_RATE = float(
+    os.getenv('REQUEST_TIMING_LOG_SAMPLE_RATE', 0.01))
+REQUEST_TIMING_SLOW_MS = int(os.getenv('REQUEST_TIMING_SLOW_MS', 500))
+
+RECIPE_SEARCH_CONFIG = 'russian'
+
+FEED_FAN_OUT_LIMIT = 5000
+FEED_BACKFILL_SIZE = 50
+
+SIMILAR_RECIPES_COUNT = 10
+SIMILAR_RECIPES_MIN_SUPPORT = 2
+SIMILAR_RECIPES_MAX_BASKET = 500
+
+TRENDING_HALF_LIFE = 24 * 60 * 60
+TRENDING_WINDOW = 7 * 24 * 60 * 60
+TRENDING_WEIGHTS = {
+    'favourite': 3.0,
+    'cart': 2.0,
+    'comment': 1.0,
+}
+
 MIDDLEWARE = [
+    'api.timing.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -124,6 +161,23 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+RECIPE_IMAGE_SIZES = {
+    'small': (320, 320),
+    'medium': (640, 640),
+}
+RECIPE_IMAGE_VARIANTS_DIR = 'recipes/variants'
+RECIPE_IMAGE_WORKERS = 2
+RECIPE_IMAGE_UPLOAD_ROOT = os.path.join(BASE_DIR, 'uploads')
+RECIPE_IMAGE_UPLOAD_MAX_AGE = 60 * 60
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+RECIPE_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+
+SHOPPING_LIST_PDF_ROOT = os.path.join(BASE_DIR, 'shopping_lists')
+SHOPPING_LIST_PDF_WORKERS = 2
+SHOPPING_LIST_PDF_QUEUE_SIZE = 20
+SHOPPING_LIST_PDF_WAIT = 10
+SHOPPING_LIST_PDF_MAX_AGE = 24 * 60 * 60
+
 
 AUTH_USER_MODEL = 'api.User'
 
@@ -132,7 +186,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -176,6 +230,9 @@ SERVER_EMAIL = EMAIL_HOST_USER
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 
+LOG_DIR = os.getenv('LOG_DIR', os.path.join(BASE_DIR, 'logs'))
+os.makedirs(LOG_DIR, exist_ok=True)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -183,7 +240,11 @@ LOGGING = {
         'file': {
             'level': 'DEBUG',
             'class': 'logging.FileHandler',
-            'filename': os.path.join(BASE_DIR, 'logs/debug.log'),
+            'filename': os.path.join(LOG_DIR, 'debug.log'),
+        },
+        'console': {
+            'level': 'INFO',
+            'class': 'logging.StreamHandler',
         },
     },
     'loggers': {
@@ -192,5 +253,10 @@ LOGGING = {
             'level': 'WARNING',
             'propagate': True,
         },
+        'api.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
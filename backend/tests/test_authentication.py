@@ -0,0 +1,55 @@
+"""
+Interleaves a token lookup with a committed token delete and checks that
+the cached token does not outlive it.
+"""
+from unittest import mock
+
+import pytest
+from api.authentication import CachedTokenAuthentication, token_cache
+from api.models import User
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture
+def token():
+    token_cache.clear()
+    User.objects.bulk_create(
+        [User(username='reader', email='reader@example.com')])
+    yield Token.objects.create(user=User.objects.get(username='reader'))
+    token_cache.clear()
+
+
+def test_delete_between_lookup_and_cache_fill_is_seen(token):
+    lookup = TokenAuthentication.authenticate_credentials
+
+    def lookup_then_delete(self, key):
+        found = lookup(self, key)
+        # The delete commits after this request has read the token row
+        # and before it stores the entry.
+        Token.objects.filter(key=key).delete()
+        return found
+
+    authentication = CachedTokenAuthentication()
+    with mock.patch.object(TokenAuthentication, 'authenticate_credentials',
+                           lookup_then_delete):
+        user, _ = authentication.authenticate_credentials(token.key)
+    assert user.username == 'reader'
+    with pytest.raises(AuthenticationFailed):
+        authentication.authenticate_credentials(token.key)
+
+
+def test_invalidation_waits_for_commit(token):
+    authentication = CachedTokenAuthentication()
+    authentication.authenticate_credentials(token.key)
+    with transaction.atomic():
+        Token.objects.filter(key=token.key).delete()
+        # Not committed yet, so other requests may still use the token.
+        assert token_cache.get(token.key) is not None
+    assert token_cache.get(token.key) is None
+    with pytest.raises(AuthenticationFailed):
+        authentication.authenticate_credentials(token.key)
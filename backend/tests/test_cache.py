@@ -0,0 +1,41 @@
+"""
+Fills the shared memory cache and checks that keys spread over every set,
+so the whole configured size is usable.
+"""
+from api.cache import ASSOCIATIVITY, SLOT_HEADER, SharedMemoryCache
+
+SLOTS = 256
+KEYS = SLOTS * 8
+
+
+def make_cache(tmp_path):
+    return SharedMemoryCache(str(tmp_path / 'cache'), {
+        'OPTIONS': {'SLOTS': SLOTS, 'SLOT_SIZE': 256},
+    })
+
+
+def test_every_set_is_reachable(tmp_path):
+    cache = make_cache(tmp_path)
+    sets = {cache._hash(cache.make_key(f'key-{number}')) % cache.sets
+            for number in range(KEYS)}
+    assert sets == set(range(SLOTS // ASSOCIATIVITY))
+
+
+def test_filling_the_cache_uses_every_slot(tmp_path):
+    cache = make_cache(tmp_path)
+    for number in range(KEYS):
+        cache.set(f'key-{number}', number)
+    assert cache.get_stats()['entries'] == SLOTS
+
+
+def test_corrupt_slot_reads_as_miss(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set('key', {'value': 1})
+    with cache._locked():
+        key = cache.make_key('key')
+        slot = cache._find(key, cache._hash(key))[0]
+        start = cache._offset(slot) + SLOT_HEADER.size + 8
+        cache._map[start:start + 4] = b'\xff' * 4
+    assert cache.get('key', 'miss') == 'miss'
+    cache.set('key', 2)
+    assert cache.get('key') == 2
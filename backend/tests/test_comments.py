@@ -0,0 +1,43 @@
+"""
+Checks that a comment and the recipe's comments_count are written in one
+transaction.
+"""
+from unittest import mock
+
+import pytest
+from api.models import Comment, Recipe, User
+from django.db import DatabaseError
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture
+def recipe():
+    User.objects.bulk_create(
+        [User(username='author', email='author@example.com')])
+    author = User.objects.get(username='author')
+    Recipe.objects.bulk_create([Recipe(
+        author=author, name='soup', text='soup', cooking_time=1,
+        image='recipes/soup.png')])
+    return Recipe.objects.get(name='soup')
+
+
+def test_comment_counts_are_shifted(recipe):
+    comment = Comment.objects.create(recipe=recipe, author=recipe.author,
+                                     text='tasty')
+    recipe.refresh_from_db()
+    assert recipe.comments_count == 1
+    comment.delete()
+    recipe.refresh_from_db()
+    assert recipe.comments_count == 0
+
+
+def test_failed_counter_update_rolls_back_the_comment(recipe):
+    with mock.patch('api.signals.shift_counter',
+                    side_effect=DatabaseError('counter update failed')):
+        with pytest.raises(DatabaseError):
+            Comment.objects.create(recipe=recipe, author=recipe.author,
+                                   text='tasty')
+    assert not Comment.objects.exists()
+    recipe.refresh_from_db()
+    assert recipe.comments_count == 0
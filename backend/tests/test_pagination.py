@@ -0,0 +1,70 @@
+"""
+Pages through the recipe list ordered by trending score with the cursor
+pagination and checks that every recipe is returned exactly once, also
+when more recipes share a score than DRF's cursor offset can step over.
+"""
+import pytest
+from api.models import Recipe, User
+from rest_framework.test import APIClient
+
+TIED = 1100
+SCORED = 50
+PAGE_SIZE = 100
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def recipes():
+    User.objects.bulk_create(
+        [User(username='author', email='author@example.com')])
+    author = User.objects.get(username='author')
+    Recipe.objects.bulk_create(
+        Recipe(author=author, name=f'recipe {number}', text='text',
+               cooking_time=1, image='recipes/recipe.png',
+               trending_score=(number % 7) / 3 if number < SCORED else 0)
+        for number in range(TIED + SCORED)
+    )
+    return list(Recipe.objects.order_by(
+        '-trending_score', '-id').values_list('id', flat=True))
+
+
+def walk(client, url, link):
+    pages = []
+    while url is not None:
+        # An offset cursor stuck on a tie would otherwise loop forever.
+        assert len(pages) <= (TIED + SCORED) // PAGE_SIZE + 1
+        response = client.get(url)
+        assert response.status_code == 200
+        pages.append([recipe['id'] for recipe in response.data['results']])
+        url = response.data[link]
+    return pages
+
+
+def test_trending_pages_reach_every_recipe(recipes):
+    client = APIClient()
+    pages = walk(client, '/api/recipes/?pagination=cursor&ordering=trending'
+                         f'&limit={PAGE_SIZE}', 'next')
+    assert [pk for page in pages for pk in page] == recipes
+    assert len(pages) == -(-len(recipes) // PAGE_SIZE)
+
+
+def test_trending_previous_links_return_the_same_pages(recipes):
+    client = APIClient()
+    url = ('/api/recipes/?pagination=cursor&ordering=trending'
+           f'&limit={PAGE_SIZE}')
+    for _ in range(3):
+        url = client.get(url).data['next']
+    response = client.get(url)
+    previous = walk(client, response.data['previous'], 'previous')
+    expected = recipes[:3 * PAGE_SIZE]
+    assert [pk for page in reversed(previous) for pk in page] == expected
+
+
+def test_trending_cursor_must_be_a_keyset(recipes):
+    client = APIClient()
+    dated = client.get('/api/recipes/?pagination=cursor&limit=10')
+    cursor = dated.data['next'].split('cursor=')[1]
+    response = client.get('/api/recipes/?pagination=cursor'
+                          f'&ordering=trending&cursor={cursor}')
+    assert response.status_code == 404
@@ -0,0 +1,160 @@
+"""
+Loads a synthetic dataset, explains the recipe list query for every filter
+combination and fails on sequential scans or large sorts. The dataset is
+rolled back afterwards.
+"""
+import itertools
+import json
+import random
+
+import pytest
+from api.filters import RecipeFilter
+from api.models import Cart, Favourite, Ingredient, Recipe, Tag, User
+from api.search import update_search_vectors
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import RequestFactory
+
+pytestmark = [
+    pytest.mark.skipif(
+        connection.vendor != 'postgresql',
+        reason='Query plans can only be checked on PostgreSQL.',
+    ),
+    pytest.mark.django_db,
+]
+
+USERS = 500
+RECIPES = 50000
+MAX_SORT_ROWS = 1000
+SEED = 0
+CHECKED_TABLES = (
+    'api_recipe',
+    'api_recipe_tags',
+    'api_favourite',
+    'api_cart',
+    'api_ingredientsamount',
+)
+WORDS = (
+    'soup', 'salad', 'pie', 'stew', 'cake', 'pasta', 'curry', 'roast',
+    'bread', 'omelette', 'pancake', 'risotto', 'casserole',
+)
+SEARCH_TERM = 'chowder'
+SEARCH_TERM_EVERY = 200
+TAGS_PER_DATASET = 8
+FILTERS = {
+    'author': lambda data: data['author'],
+    'tags': lambda data: data['tag'],
+    'is_favorited': lambda data: '1',
+    'is_in_shopping_cart': lambda data: '1',
+    'search': lambda data: SEARCH_TERM,
+    'ordering': lambda data: 'trending',
+}
+COMBINATIONS = [
+    names
+    for size in range(len(FILTERS) + 1)
+    for names in itertools.combinations(FILTERS, size)
+]
+
+
+def explain(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        result = cursor.fetchone()[0]
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]['Plan']
+
+
+def walk(plan):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from walk(child)
+
+
+def plan_problems(plan):
+    for node in walk(plan):
+        if (node['Node Type'] == 'Seq Scan'
+                and node.get('Relation Name') in CHECKED_TABLES):
+            yield f'sequential scan on {node["Relation Name"]}'
+        if node['Node Type'] == 'Sort':
+            rows = sum(child['Plan Rows'] for child in node.get('Plans', ()))
+            if rows > MAX_SORT_ROWS:
+                yield f'sort over {rows} rows'
+
+
+def load_dataset():
+    rng = random.Random(SEED)
+    users = User.objects.bulk_create(
+        User(username=f'plan-check-{number}',
+             email=f'plan-check-{number}@example.com',
+             first_name='Plan', last_name='Check')
+        for number in range(USERS)
+    )
+    tags = Tag.objects.bulk_create(
+        Tag(name=f'plan-check-{number}', slug=f'plan-check-{number}',
+            color=f'#{number:06x}')
+        for number in range(TAGS_PER_DATASET)
+    )
+    ingredient = Ingredient.objects.create(
+        name='plan-check', measurement_unit='g')
+    recipes = Recipe.objects.bulk_create(
+        Recipe(author=rng.choice(users),
+               name=(f'{SEARCH_TERM} {number}'
+                     if number % SEARCH_TERM_EVERY == 0
+                     else f'{rng.choice(WORDS)} {number}'),
+               text=' '.join(rng.sample(WORDS, 3)),
+               cooking_time=rng.randint(1, 120),
+               image='recipes/plan-check.png')
+        for number in range(RECIPES)
+    )
+    recipe_ids = [recipe.id for recipe in recipes]
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag.id)
+        for recipe_id in recipe_ids
+        for tag in rng.sample(tags, 2)
+    )
+    Recipe.ingredients.through.objects.bulk_create(
+        Recipe.ingredients.through(recipe_id=recipe_id,
+                                   ingredient=ingredient, amount=1)
+        for recipe_id in recipe_ids
+    )
+    for model in (Favourite, Cart):
+        model.objects.bulk_create(
+            model(user=user, recipe_id=recipe_id)
+            for user in users
+            for recipe_id in rng.sample(recipe_ids, 20)
+        )
+    update_search_vectors(Recipe.objects.filter(pk__in=recipe_ids))
+    with connection.cursor() as cursor:
+        for table in CHECKED_TABLES:
+            cursor.execute(f'ANALYZE {table}')
+    return {
+        'user': users[0],
+        'author': str(users[1].pk),
+        'tag': tags[0].slug,
+    }
+
+
+@pytest.fixture(scope='module')
+def dataset(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock(), transaction.atomic():
+        yield load_dataset()
+        transaction.set_rollback(True)
+
+
+@pytest.mark.parametrize('names', COMBINATIONS,
+                         ids=lambda names: '-'.join(names) or 'no-filters')
+def test_recipe_list_plan_uses_indexes(dataset, names):
+    params = {name: FILTERS[name](dataset) for name in names}
+    request = RequestFactory().get('/api/recipes/', params)
+    request.user = dataset['user']
+    filterset = RecipeFilter(
+        request.GET,
+        queryset=Recipe.objects.with_user_flags(request.user),
+        request=request,
+    )
+    assert filterset.is_valid(), filterset.errors.as_text()
+    plan = explain(filterset.qs[:settings.REST_FRAMEWORK['PAGE_SIZE']])
+    problems = sorted(set(plan_problems(plan)))
+    assert not problems, json.dumps(plan, indent=2)
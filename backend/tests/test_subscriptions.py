@@ -0,0 +1,43 @@
+"""
+Checks that recipes_limit on the subscriptions list is validated before it
+reaches the per-author recipe query.
+"""
+import pytest
+from api.models import Follow, Recipe, User
+from rest_framework.test import APIClient
+
+URL = '/api/users/subscriptions/'
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def client():
+    User.objects.bulk_create(
+        User(username=name, email=f'{name}@example.com')
+        for name in ('reader', 'author'))
+    reader = User.objects.get(username='reader')
+    author = User.objects.get(username='author')
+    Follow.objects.bulk_create([Follow(author=reader, user=author)])
+    Recipe.objects.bulk_create(
+        Recipe(author=author, name=f'recipe {number}', text='text',
+               cooking_time=1, image='recipes/recipe.png')
+        for number in range(3))
+    client = APIClient()
+    client.force_authenticate(reader)
+    return client
+
+
+@pytest.mark.parametrize('recipes_limit', ['abc', '-1', '1.5', ''])
+def test_invalid_recipes_limit_is_rejected(client, recipes_limit):
+    response = client.get(URL, {'recipes_limit': recipes_limit})
+    assert response.status_code == 400
+    assert 'recipes_limit' in response.data
+
+
+@pytest.mark.parametrize('recipes_limit, count', [('0', 0), ('2', 2),
+                                                  ('10', 3)])
+def test_recipes_limit_caps_recipes(client, recipes_limit, count):
+    response = client.get(URL, {'recipes_limit': recipes_limit})
+    assert response.status_code == 200
+    assert len(response.data['results'][0]['recipes']) == count
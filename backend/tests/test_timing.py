@@ -0,0 +1,59 @@
+"""
+Checks that streamed responses are timed until the stream is closed
+instead of getting a Server-Timing header from before the body exists.
+"""
+import json
+from unittest import mock
+
+import pytest
+from api.models import Ingredient, ShoppingListItem, User
+from rest_framework.test import APIClient
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def client():
+    User.objects.bulk_create(
+        [User(username='shopper', email='shopper@example.com')])
+    user = User.objects.get(username='shopper')
+    Ingredient.objects.bulk_create(
+        Ingredient(name=name, measurement_unit='g')
+        for name in ('flour', 'sugar'))
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(user=user, ingredient=ingredient, amount=100)
+        for ingredient in Ingredient.objects.all())
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def logger():
+    with mock.patch('api.timing.should_log', return_value=True):
+        with mock.patch('api.timing.logger') as logger:
+            yield logger
+
+
+def logged(logger):
+    return [json.loads(call.args[0]) for call in logger.info.call_args_list]
+
+
+def test_streamed_response_is_logged_after_the_body(client, logger):
+    response = client.get('/api/recipes/download_shopping_cart/')
+    assert response.streaming
+    assert 'Server-Timing' not in response
+    assert logged(logger) == []
+    body = b''.join(response.streaming_content)
+    response.close()
+    assert b'flour' in body and b'sugar' in body
+    entry, = logged(logger)
+    assert entry['view'] == 'DownloadShoppingCart'
+    assert entry['queries'] >= 1
+
+
+def test_regular_response_has_server_timing(client, logger):
+    response = client.get('/api/ingredients/')
+    assert 'db;dur=' in response['Server-Timing']
+    entry, = logged(logger)
+    assert entry['view'] == 'IngredientViewSet'
@@ -0,0 +1,98 @@
+"""
+Hammers the favourite and cart toggles for one (user, recipe) pair from
+many threads and checks that the rows, the counters and the shopping list
+end up consistent.
+"""
+import threading
+from unittest import skipUnless
+
+from api import shopping_list
+from api.models import (Cart, Favourite, Ingredient, IngredientsAmount, Recipe,
+                        User)
+from django.db import connection
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+THREADS = 16
+ROUNDS = 10
+ENDPOINTS = (
+    (Favourite, 'favourites_count', '/api/recipes/{}/favorite/'),
+    (Cart, 'carts_count', '/api/recipes/{}/shopping_cart/'),
+)
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'The toggles are single statements only on PostgreSQL.')
+class ToggleContentionTests(TransactionTestCase):
+    def setUp(self):
+        self.user, author = User.objects.bulk_create(
+            User(username=name, email=f'{name}@example.com')
+            for name in ('hammer', 'author'))
+        self.recipe, = Recipe.objects.bulk_create([Recipe(
+            author=author, name='viral', text='viral', cooking_time=1,
+            image='recipes/viral.png')])
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ingredient {number}', measurement_unit='g')
+            for number in range(3))
+        IngredientsAmount.objects.bulk_create(
+            IngredientsAmount(recipe=self.recipe, ingredient=ingredient,
+                              amount=number + 1)
+            for number, ingredient in enumerate(ingredients))
+
+    def hammer(self, url, methods):
+        barrier = threading.Barrier(THREADS)
+        statuses = []
+
+        def run(method):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                for _ in range(ROUNDS):
+                    statuses.append(getattr(client, method)(url).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(methods[number % 2],))
+                   for number in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return statuses
+
+    def assert_consistent(self, model, counter):
+        rows = model.objects.filter(user=self.user, recipe=self.recipe)
+        self.recipe.refresh_from_db()
+        self.assertLessEqual(rows.count(), 1)
+        self.assertEqual(getattr(self.recipe, counter), rows.count())
+        self.assertEqual(shopping_list.find_drift([self.user.pk]), [])
+        return rows.count()
+
+    def test_concurrent_adds_create_one_row(self):
+        for model, counter, url in ENDPOINTS:
+            with self.subTest(model=model.__name__):
+                statuses = self.hammer(url.format(self.recipe.pk),
+                                       ('get', 'get'))
+                self.assertEqual(statuses.count(201), 1)
+                self.assertEqual(statuses.count(400), len(statuses) - 1)
+                self.assertEqual(self.assert_consistent(model, counter), 1)
+
+    def test_concurrent_removes_delete_one_row(self):
+        for model, counter, url in ENDPOINTS:
+            with self.subTest(model=model.__name__):
+                model.objects.create(user=self.user, recipe=self.recipe)
+                statuses = self.hammer(url.format(self.recipe.pk),
+                                       ('delete', 'delete'))
+                self.assertEqual(statuses.count(204), 1)
+                self.assertEqual(self.assert_consistent(model, counter), 0)
+
+    def test_concurrent_toggles_keep_counters_in_step(self):
+        for model, counter, url in ENDPOINTS:
+            with self.subTest(model=model.__name__):
+                statuses = self.hammer(url.format(self.recipe.pk),
+                                       ('get', 'delete'))
+                self.assertNotIn(500, statuses)
+                present = self.assert_consistent(model, counter)
+                self.assertEqual(statuses.count(201)
+                                 - statuses.count(204), present)
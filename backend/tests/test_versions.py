@@ -0,0 +1,53 @@
+"""
+Checks that warm ingredient autocomplete requests are served without
+touching the database and that a bump reaches them after the commit.
+"""
+import pytest
+from api import versions
+from api.ingredient_index import ingredient_index
+from api.models import Ingredient
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.test import APIClient
+
+URL = '/api/ingredients/?name=ap'
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture
+def ingredients():
+    for name in (versions.INGREDIENTS, versions.TAGS):
+        cache.delete(versions.CACHE_KEY.format(name))
+    ingredient_index.invalidate()
+    Ingredient.objects.bulk_create(
+        Ingredient(name=name, measurement_unit='g')
+        for name in ('apple', 'apricot', 'banana'))
+    yield
+    ingredient_index.invalidate()
+
+
+def names(response):
+    return [item['name'] for item in response.data]
+
+
+def test_warm_autocomplete_runs_no_queries(ingredients,
+                                           django_assert_num_queries):
+    client = APIClient()
+    assert names(client.get(URL)) == ['apple', 'apricot']
+    with django_assert_num_queries(0):
+        response = client.get(URL)
+    assert names(response) == ['apple', 'apricot']
+
+
+def test_bump_is_published_after_commit(ingredients):
+    client = APIClient()
+    etag = client.get(URL)['ETag']
+    with transaction.atomic():
+        Ingredient.objects.bulk_create(
+            [Ingredient(name='apricot jam', measurement_unit='g')])
+        versions.bump(versions.INGREDIENTS)
+        assert client.get(URL)['ETag'] == etag
+    response = client.get(URL)
+    assert response['ETag'] != etag
+    assert names(response) == ['apple', 'apricot', 'apricot jam']